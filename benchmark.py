@@ -0,0 +1,456 @@
+#!/usr/bin/env python
+"""Benchmarks for the word bank build, loading, word picking and game play hot paths.
+
+Everything runs offline against the files in this directory with fixed seeds.  The build
+benchmarks use a words file made up from the word bank (plus names, acronyms and short words for
+the filters to throw away), written to a temp dir.  build.stream_cold and build.stream_cached time
+word_parse.py's default build end to end, the other build benchmarks its stages and the --in-memory
+helpers.  Results are written as JSON so runs from two commits can be compared:
+
+    python3 benchmark.py -o before.json
+    python3 benchmark.py -o after.json --compare before.json
+    python3 benchmark.py -b guess          - only the benchmarks with "guess" in their name
+    python3 benchmark.py --memory          - peak tracemalloc and RSS of each benchmark, each in its own process
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from functools import cached_property
+
+import word_parse
+from engine import (HangmanEngine, GameState, new_game_config, determine_round_word, get_random_word_in_difficulty,
+    get_weighted_word_in_difficulty, initialize_word_in_config, process_raw_input, process_round_input,
+    update_config_after_guess, update_config_after_round)
+from generate import generate_puzzles, write_jsonl
+from name_index import NameIndex, ensure_name_index
+from word_bank import (BinaryWordBank, WordBank, WordScores, WordWeights, load_word_bank, write_binary_bank_buckets,
+    write_weights)
+
+SEED = 1234
+NAMES_FILES = ("names/first_names.txt", "names/last_names.txt", "names/names.idx") #first, last and the index word_parse.py builds
+LETTER_ORDER = "etaoinshrdlcumwfgypbvkjxqz"
+REGRESSION = 0.10 #--compare flags benchmarks that got this much slower
+
+BENCHMARKS = {} #name:function(context) returning (the function to time, operations per call)
+
+
+def benchmark(name):
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+class BenchContext:
+    """Files and objects the benchmarks share, made the first time one asks for them"""
+
+    def __init__(self, temp_dir, words_lines=100000):
+        self.temp_dir = temp_dir
+        self.words_lines = words_lines
+
+    @cached_property
+    def bank(self):
+        return load_word_bank("hangman_word_bank", "hangman_word_bank.bin", scores_path="hangman_word_bank_scores")
+
+    @cached_property
+    def words_path(self):
+        """A words file like /usr/share/dict/words - bank words, some capitalised, mixed with names,
+        acronyms and words too short for the bank"""
+        rng = random.Random(SEED)
+        bank = self.bank
+        with open("names/first_names.txt") as f:
+            names = [line.strip() for line in f][:2000]
+        lines = []
+        for _ in range(self.words_lines):
+            kind = rng.random()
+            if kind < 0.8:
+                word = bank.get_word(rng.randint(1, len(bank)))
+                lines.append(word.capitalize() if rng.random() < 0.1 else word)
+            elif kind < 0.9:
+                lines.append(rng.choice(names))
+            elif kind < 0.95:
+                lines.append("".join(rng.choice(LETTER_ORDER) for _ in range(rng.randint(3, 5))).upper())
+            else:
+                lines.append("".join(rng.choice(LETTER_ORDER) for _ in range(rng.randint(1, 2))))
+        path = os.path.join(self.temp_dir, "words")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    @cached_property
+    def names(self):
+        first, last = set(), set()
+        with redirect_stdout(io.StringIO()):
+            word_parse.create_names("names/first_names.txt", first)
+            word_parse.create_names("names/last_names.txt", last)
+        return first, last
+
+    @cached_property
+    def parsed_words(self):
+        words = []
+        with redirect_stdout(io.StringIO()):
+            word_parse.parse_words_file(self.words_path, words, *self.names)
+        return words
+
+    @cached_property
+    def words_data(self):
+        with open(self.words_path, "rb") as f:
+            return f.read()
+
+    @cached_property
+    def name_index_path(self):
+        ensure_name_index(*NAMES_FILES)
+        return NAMES_FILES[2]
+
+    def build_word_bank(self, name, cache_dir):
+        """word_parse.py's default (streaming) build of the words file into files named name in the temp dir"""
+        out = os.path.join(self.temp_dir, name)
+        return word_parse.build_word_bank(self.words_path, out, out + "_idx", out + ".bin", out + "_scores", *NAMES_FILES[:2],
+            self.name_index_path, cache_dir=cache_dir)
+
+    @cached_property
+    def weighted_bank(self):
+        """The word bank with made up Zipf like weights"""
+        rng = random.Random(SEED)
+        path = os.path.join(self.temp_dir, "weights")
+        write_weights([1 + int(1000 / rng.randint(1, 1000)) for _ in range(len(self.bank))], path)
+        return WordBank(self.bank.words, scores=self.bank.scores, weights=WordWeights(path))
+
+
+@benchmark("build.names")
+def bench_build_names(context):
+    def run():
+        with redirect_stdout(io.StringIO()):
+            word_parse.create_names("names/first_names.txt", set())
+            word_parse.create_names("names/last_names.txt", set())
+    lines = 0
+    for path in ("names/first_names.txt", "names/last_names.txt"):
+        with open(path) as f:
+            lines += sum(1 for _ in f)
+    return run, lines
+
+@benchmark("build.parse")
+def bench_build_parse(context):
+    words_path = context.words_path
+    first, last = context.names
+    def run():
+        with redirect_stdout(io.StringIO()):
+            word_parse.parse_words_file(words_path, [], first, last)
+    return run, context.words_lines
+
+@benchmark("build.sort")
+def bench_build_sort(context):
+    parsed = context.parsed_words
+    def run():
+        word_parse.arrange_word_list(list(parsed))
+    return run, len(parsed)
+
+@benchmark("build.index_write")
+def bench_build_index_write(context):
+    words = list(context.parsed_words)
+    word_parse.arrange_word_list(words)
+    path = os.path.join(context.temp_dir, "idx")
+    def run():
+        stats = {"first_line": 1, "last_line": 0}
+        indices = {}
+        word_parse.create_word_indices(words, indices, stats)
+        word_parse.create_word_indices_file(indices, path, stats)
+    return run, len(words)
+
+@benchmark("build.binary_write")
+def bench_build_binary_write(context):
+    words = list(context.parsed_words)
+    word_parse.arrange_word_list(words)
+    path = os.path.join(context.temp_dir, "bin")
+    def run():
+        word_parse.create_binary_word_bank_file(words, path)
+    return run, len(words)
+
+@benchmark("build.name_lookup")
+def bench_build_name_lookup(context):
+    """NameIndex.is_name over the words file - the names check filter_chunk makes for each valid word"""
+    index = NameIndex(context.name_index_path)
+    words = [word_parse.parse_word_line(line) for line in context.words_data.decode("utf-8").splitlines()]
+    def run():
+        for word in words:
+            index.is_name(word)
+    return run, len(words)
+
+@benchmark("build.filter_chunk")
+def bench_build_filter_chunk(context):
+    """filter_chunk over the whole words file as one chunk - what each build worker does per chunk"""
+    word_parse.init_filter(context.name_index_path)
+    data = context.words_data
+    def run():
+        word_parse.filter_chunk(data)
+    return run, context.words_lines
+
+@benchmark("build.bucket_write")
+def bench_build_bucket_write(context):
+    """write_binary_bank_buckets - the streaming build's binary bank writer"""
+    buckets = {}
+    for word in context.parsed_words:
+        buckets.setdefault(len(word) - 1, []).append(word)
+    for words in buckets.values():
+        words.sort()
+    path = os.path.join(context.temp_dir, "buckets.bin")
+    def run():
+        write_binary_bank_buckets([(length, len(buckets[length]), buckets[length]) for length in sorted(buckets)], path)
+    return run, len(context.parsed_words)
+
+@benchmark("build.stream_cold")
+def bench_build_stream_cold(context):
+    """word_parse.py's default build with nothing cached"""
+    def run():
+        context.build_word_bank("cold", None)
+    return run, context.words_lines
+
+@benchmark("build.stream_cached")
+def bench_build_stream_cached(context):
+    """word_parse.py's default build with every chunk and bucket cached but the outputs gone - the
+    merge is skipped, the word bank files and scores are written again"""
+    cache_dir = os.path.join(context.temp_dir, "cache")
+    context.build_word_bank("cached", cache_dir)
+    def run():
+        os.remove(os.path.join(context.temp_dir, "cached"))
+        stats = context.build_word_bank("cached", cache_dir)
+        assert stats["chunks_cached"] == stats["chunks"] and not stats["buckets_rebuilt"]
+    return run, context.words_lines
+
+@benchmark("load.word_bank")
+def bench_load_word_bank(context):
+    """What load_word_bank does the first time - opened directly so the cached bank the others use isn't closed"""
+    def run():
+        WordBank(BinaryWordBank("hangman_word_bank.bin"), scores=WordScores("hangman_word_bank_scores")).close()
+    return run, 1
+
+@benchmark("load.weighted_bank")
+def bench_load_weighted_bank(context):
+    """Opening a bank with weights - its alias tables are built as it is opened"""
+    words = context.weighted_bank.words
+    weights = context.weighted_bank.weights
+    def run():
+        WordBank(words, scores=context.bank.scores, weights=weights)
+    return run, 1
+
+@benchmark("sample.uniform")
+def bench_sample_uniform(context):
+    bank = context.bank
+    rng = random.Random(SEED)
+    def run():
+        for _ in range(10000):
+            get_random_word_in_difficulty(bank, "medium", rng)
+    return run, 10000
+
+@benchmark("sample.round_word")
+def bench_sample_round_word(context):
+    """determine_round_word's no repeat path - the player's permutation sampler"""
+    bank = context.bank
+    rng = random.Random(SEED)
+    config = GameState()
+    config["mode"] = "r"
+    def run():
+        for _ in range(10000):
+            determine_round_word(config, bank, rng)
+    return run, 10000
+
+@benchmark("sample.weighted")
+def bench_sample_weighted(context):
+    """Weighted draws with the within a game repeat check (a new game every 3 rounds)"""
+    bank = context.weighted_bank
+    rng = random.Random(SEED)
+    config = GameState()
+    def run():
+        for i in range(10000):
+            if i % 3 == 0:
+                config["game_lines"].clear()
+            get_weighted_word_in_difficulty(config, bank, "medium", rng)
+    return run, 10000
+
+@benchmark("generate.jsonl")
+def bench_generate_jsonl(context):
+    """generate.py - different words streamed to JSONL in memory"""
+    bank = context.bank
+    def run():
+        write_jsonl(generate_puzzles(bank, 10000, seed=SEED), io.StringIO())
+    return run, 10000
+
+@benchmark("guess.raw_input")
+def bench_guess_raw_input(context):
+    inputs = ["e", "T", "", "0", "7", "xyz"] * 1000
+    def run():
+        for user_input in inputs:
+            process_raw_input(user_input)
+    return run, len(inputs)
+
+@benchmark("guess.round_input")
+def bench_guess_round_input(context):
+    config = GameState()
+    initialize_word_in_config(config, "benchmarking")
+    for letter in "ean":
+        update_config_after_guess(config, letter)
+    inputs = list(LETTER_ORDER) * 200
+    def run():
+        for user_input in inputs:
+            process_round_input(config, user_input)
+    return run, len(inputs)
+
+@benchmark("guess.update")
+def bench_guess_update(context):
+    """Whole rounds of update_config_after_guess - word set up, then letters until it is solved"""
+    rng = random.Random(SEED)
+    words = [context.bank.sample("random", rng) for _ in range(500)]
+    config = GameState(len(words) + 1, len(LETTER_ORDER))
+    guesses = 0
+    for word in words:
+        letters = set(word)
+        for letter in LETTER_ORDER:
+            guesses += 1
+            letters.discard(letter)
+            if not letters:
+                break
+    def run():
+        for word in words:
+            initialize_word_in_config(config, word)
+            for letter in LETTER_ORDER:
+                update_config_after_guess(config, letter)
+                if config["digits_guessed"] == config["digits_in_word"]:
+                    break
+            update_config_after_round(config)
+    return run, guesses
+
+@benchmark("guess.engine")
+def bench_guess_engine(context):
+    """HangmanEngine.guess, new rounds included - enough strikes that every round is won"""
+    engine = HangmanEngine(context.bank, new_game_config(10 ** 9, len(LETTER_ORDER)), random.Random(SEED))
+    engine.new_game("r")
+    def run():
+        i = 0
+        for _ in range(20000):
+            if engine.guess(LETTER_ORDER[i]).round_over:
+                i = 0
+            else:
+                i += 1
+    return run, 20000
+
+@benchmark("game.cli")
+def bench_game_cli(context):
+    """Whole games through hangman.py with the guesses piped to stdin (includes starting Python)"""
+    script = ("e\n" + "\n".join(LETTER_ORDER) + "\n") + ("\n".join(LETTER_ORDER) + "\n") * 2 + "0\n"
+    def run():
+        for _ in range(3):
+            subprocess.run([sys.executable, "hangman.py"], input=script, text=True, stdout=subprocess.DEVNULL, check=True)
+    return run, 3
+
+
+def measure(run, ops, repeat):
+    """Times run() repeat times after a warm up call.  The best time is the one to compare"""
+    run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {"seconds": times[0], "median_seconds": times[len(times) // 2], "ops": ops, "ops_per_second": ops / times[0]}
+
+def measure_memory(name, words_lines):
+    """Runs a benchmark once in this process with tracemalloc on (covers its setup too) - meant for a fresh process"""
+    with tempfile.TemporaryDirectory(prefix="hangman_bench_") as temp_dir:
+        tracemalloc.start()
+        run, ops = BENCHMARKS[name](BenchContext(temp_dir, words_lines))
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"tracemalloc_peak_kb": peak // 1024, "tracemalloc_current_kb": current // 1024,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "children_max_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(names, repeat, words_lines, memory):
+    results = {}
+    if memory:
+        for name in names:
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), "--memory-child", name, "--words-lines", str(words_lines)],
+                capture_output=True, text=True, check=True)
+            results[name] = json.loads(child.stdout)
+            print_result(name, results[name], True)
+        return results
+    with tempfile.TemporaryDirectory(prefix="hangman_bench_") as temp_dir:
+        context = BenchContext(temp_dir, words_lines)
+        for name in names:
+            run, ops = BENCHMARKS[name](context)
+            results[name] = measure(run, ops, repeat)
+            print_result(name, results[name], False)
+    return results
+
+def print_result(name, result, memory):
+    if memory:
+        print("{:<20} tracemalloc peak {:>8,} kB   max RSS {:>8,} kB".format(name, result["tracemalloc_peak_kb"],
+            max(result["max_rss_kb"], result["children_max_rss_kb"])))
+    else:
+        print("{:<20} {:>14,.0f} ops/s   best {:.4f}s  median {:.4f}s".format(name, result["ops_per_second"],
+            result["seconds"], result["median_seconds"]))
+
+def compare(results, baseline_path):
+    """Prints the change in ops/s against an earlier run's JSON"""
+    with open(baseline_path, "r") as f:
+        baseline = json.load(f)
+    print()
+    print("Compared with {} ({})".format(baseline_path, baseline["meta"].get("commit") or "unknown commit"))
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None or "ops_per_second" not in old or "ops_per_second" not in result:
+            continue
+        change = result["ops_per_second"] / old["ops_per_second"] - 1
+        flag = "  <-- slower" if change < -REGRESSION else ""
+        print("{:<20} {:>+7.1%}{}".format(name, change, flag))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the hangman hot paths")
+    parser.add_argument("-b", "--bench", nargs="+", help="only run benchmarks whose names contain one of these")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="timed runs per benchmark (the best is reported)")
+    parser.add_argument("--words-lines", type=int, default=100000, help="lines in the made up words file for the build benchmarks")
+    parser.add_argument("--memory", action="store_true", help="measure peak memory instead of time, each benchmark in a fresh process")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="JSON", help="compare with the results of an earlier run")
+    parser.add_argument("--memory-child", help=argparse.SUPPRESS)
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__))) #the word bank and names files are relative to here
+    if args.memory_child:
+        print(json.dumps(measure_memory(args.memory_child, args.words_lines)))
+        return
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return
+    names = [name for name in BENCHMARKS if not args.bench or any(part in name for part in args.bench)]
+    results = run_benchmarks(names, args.repeat, args.words_lines, args.memory)
+    report = {"meta": {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+        "platform": platform.platform(), "mode": "memory" if args.memory else "time", "repeat": args.repeat,
+        "words_lines": args.words_lines, "seed": SEED}, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
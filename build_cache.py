@@ -0,0 +1,195 @@
+"""Build cache for word_parse.py so word bank rebuilds only redo the parts whose inputs changed.
+
+The cache directory holds:
+    manifest.json     - hashes of the last build's settings, names files and words file, the
+                        chunks it was made from, each length bucket's key and word count and the output files
+    chunks/<hash>     - the filtered words of one chunk of the words file, sorted by length then
+                        alphabetically, with <hash>.json recording where each length's section starts
+    buckets/len<N>    - the merged, sorted words of one length, each word once
+    strikes/<key>     - the solver strikes (a byte per word) of the bucket with that key, for --solver-scores
+
+Chunks are keyed by a hash of their content (plus the settings and names), so an unchanged chunk is
+never filtered twice.  A bucket's key is a hash of the sections that went into it, so a bucket is
+only re-merged when one of its sections changed.
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import tempfile
+
+MANIFEST_VERSION = 2
+MAX_FAN_IN = 128 #most files merged at once - more sections than this are merged in passes
+
+
+def hash_file(path, block_size=1 << 20):
+    """sha256 hex digest of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def hash_values(*values):
+    """sha256 hex digest of some strings"""
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(value.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def file_signature(path):
+    """(size, modified time) of a file, or None when it doesn't exist - used to spot outputs changed since the build"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BuildCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.chunks_dir = os.path.join(cache_dir, "chunks")
+        self.buckets_dir = os.path.join(cache_dir, "buckets")
+        self.strikes_dir = os.path.join(cache_dir, "strikes")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.buckets_dir, exist_ok=True)
+        os.makedirs(self.strikes_dir, exist_ok=True)
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.manifest = self.load_manifest()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+
+    def save_manifest(self, manifest):
+        manifest["version"] = MANIFEST_VERSION
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path) #a half written manifest would look like a valid build
+        self.manifest = manifest
+
+    def is_up_to_date(self, inputs, outputs):
+        """True when the last build had the same input hashes and its outputs haven't been touched since"""
+        manifest = self.manifest
+        if manifest.get("inputs") != inputs:
+            return False
+        recorded = manifest.get("outputs", {})
+        return set(recorded) == set(outputs) and all(file_signature(path) == recorded[path] and recorded[path] is not None for path in outputs)
+
+    def chunk_path(self, chunk_hash):
+        return os.path.join(self.chunks_dir, chunk_hash)
+
+    def load_chunk(self, chunk_hash):
+        """Returns the length:[byte offset, count, digest] sections of a cached chunk, or None if it isn't cached"""
+        try:
+            with open(self.chunk_path(chunk_hash) + ".json", "r") as f:
+                return {int(length): section for length, section in json.load(f).items()}
+        except (OSError, ValueError):
+            return None
+
+    def save_chunk(self, chunk_hash, buckets):
+        """Writes the filtered words of a chunk (length:sorted list of words) and returns its sections"""
+        sections = {}
+        offset = 0
+        with open(self.chunk_path(chunk_hash), "wb") as f:
+            for length in sorted(buckets):
+                data = "".join(word + "\n" for word in buckets[length]).encode("utf-8")
+                f.write(data)
+                sections[length] = [offset, len(buckets[length]), hashlib.sha256(data).hexdigest()]
+                offset += len(data)
+        with open(self.chunk_path(chunk_hash) + ".json", "w") as f:
+            json.dump(sections, f) #written last - a chunk without its .json isn't treated as cached
+        return sections
+
+    def bucket_path(self, length):
+        return os.path.join(self.buckets_dir, f"len{length}")
+
+    def bucket_is_current(self, length, key):
+        return (self.manifest.get("buckets", {}).get(str(length)) == key and str(length) in self.manifest.get("bucket_counts", {})
+            and os.path.exists(self.bucket_path(length)))
+
+    def bucket_count(self, length):
+        """Words in a current bucket, as recorded by the last build"""
+        return self.manifest["bucket_counts"][str(length)]
+
+    def build_bucket(self, length, sections):
+        """Merges the (chunk hash, byte offset, count) sections of one length into the bucket file and
+        returns how many words it has - a word in more than one section is only written once"""
+        sources = [(self.chunk_path(chunk_hash), offset, count) for chunk_hash, offset, count in sections]
+        return merge_sections(sources, self.bucket_path(length), self.cache_dir)
+
+    def load_strikes(self, bucket_key):
+        """Returns the solver strikes saved for the bucket key, or None"""
+        try:
+            with open(os.path.join(self.strikes_dir, bucket_key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def save_strikes(self, bucket_key, strikes):
+        temp_path = os.path.join(self.strikes_dir, bucket_key + ".tmp")
+        with open(temp_path, "wb") as f:
+            f.write(strikes)
+        os.replace(temp_path, os.path.join(self.strikes_dir, bucket_key))
+
+    def prune(self, chunk_hashes, lengths, bucket_keys=()):
+        """Removes chunks, buckets and bucket strikes that the current build didn't use"""
+        keep = set(chunk_hashes)
+        for name in os.listdir(self.chunks_dir):
+            if name.split(".")[0] not in keep:
+                os.remove(os.path.join(self.chunks_dir, name))
+        keep = {f"len{length}" for length in lengths}
+        for name in os.listdir(self.buckets_dir):
+            if name not in keep:
+                os.remove(os.path.join(self.buckets_dir, name))
+        keep = set(bucket_keys)
+        for name in os.listdir(self.strikes_dir):
+            if name not in keep:
+                os.remove(os.path.join(self.strikes_dir, name))
+
+
+def read_section(path, offset, count):
+    """Yields count lines from path starting at the byte offset"""
+    with open(path, "r", encoding="utf-8") as f:
+        f.seek(offset)
+        for _ in range(count):
+            yield f.readline()
+
+def merge_sections(sources, out_path, temp_dir):
+    """Merges sorted (path, byte offset, count) sections into out_path, at most MAX_FAN_IN at a time,
+    without duplicates.  Returns the number of words written"""
+    passes_dir = None
+    try:
+        while len(sources) > MAX_FAN_IN:
+            if passes_dir is None:
+                passes_dir = tempfile.mkdtemp(prefix="merge_", dir=temp_dir)
+            merged = []
+            for i in range(0, len(sources), MAX_FAN_IN):
+                group_path = os.path.join(passes_dir, f"pass{len(os.listdir(passes_dir))}")
+                count = merge_group(sources[i:i + MAX_FAN_IN], group_path)
+                merged.append((group_path, 0, count))
+            sources = merged
+        return merge_group(sources, out_path)
+    finally:
+        if passes_dir is not None:
+            shutil.rmtree(passes_dir, ignore_errors=True)
+
+def merge_group(sources, out_path):
+    count = 0
+    previous = None
+    with open(out_path, "w", encoding="utf-8") as f:
+        for word in heapq.merge(*(read_section(*source) for source in sources)):
+            if word != previous: #the sections are sorted, so a word in several of them comes out together
+                f.write(word)
+                count += 1
+                previous = word
+    return count
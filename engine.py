@@ -0,0 +1,493 @@
+"""Headless hangman game engine - the game rules without any input() or print() calls.
+
+The command line game in hangman.py is a front end on top of this, and anything else that
+wants to drive games (simulations, servers, benchmarks) can use HangmanEngine directly:
+
+    engine = HangmanEngine(load_word_bank("hangman_word_bank", "hangman_word_bank.bin"))
+    engine.new_game("p")
+    result = engine.guess("e")
+    engine.state()
+
+A game can be parked with engine.snapshot() (a few dozen bytes) and picked up again later with
+engine.restore(data) on an engine over the same word bank.  Games are recorded when the engine is
+given a recorder (replay.ReplayLog.recorder()).
+"""
+
+import random
+import struct
+import unicodedata
+from enum import Enum
+from typing import NamedTuple
+
+import metrics
+from sampler import PermutationSampler
+from solver import LETTERS, get_solver_index, random_member
+
+ADVERSARIAL_MODE = "a"
+
+SNAPSHOT_VERSION = 2
+#version, mode, number of rounds, current round, rounds won, max strikes, strikes, flags, number of samplers,
+#number of game lines, words in the bank, word line, bytes of guessed letters mask (bit i is the bank's alphabet[i])
+SNAPSHOT_HEADER = struct.Struct("<BcHHHBBBBBIIB")
+SNAPSHOT_SAMPLER = struct.Struct("<BIII") #difficulty, then the sampler cursor - seed, cycle, index
+SNAPSHOT_DIFFICULTIES = ("easy", "medium", "hard", "random")
+EXIT_REQUESTED = 1 #snapshot flags
+PRINT_MODE = 2
+LETTER_BITS = {letter: 1 << i for i, letter in enumerate(LETTERS)} #letter:its bit in guessed_mask (a to z only)
+MAX_ROUNDS = 255 #largest number of rounds and max strikes a snapshot can hold - the game lines are counted in a
+MAX_STRIKES = 254 #byte, and a lost round ends on max strikes + 1
+
+
+class InputStatus(Enum):
+    VALID = 1
+    EMPTY = 2
+    INVALID = 3
+    EXIT = 4
+
+class GuessStatus(Enum):
+    INCORRECT = 1
+    CORRECT = 2
+    DUPLICATE = 3
+    NONE = 4 #placeholder for an invalid, empty, or exit guess
+
+class GameStateError(Exception):
+    """Raised when the engine is asked to guess without a game in progress"""
+    pass
+
+class GuessResult(NamedTuple):
+    input_status: InputStatus
+    guess_status: GuessStatus
+    value: str #the guessed letter, or an error string when the input wasn't valid
+    round_over: bool = False
+    round_won: bool = False
+    word: str = "" #the round's word once the round is over
+    game_over: bool = False
+    strikes: int = 0 #strikes at the end of the round (only set once the round is over)
+
+
+def new_game_config(number_rounds=3, max_strikes=5):
+    """Returns the game state part of the config dictionary"""
+    return {"print_mode": True,
+        "word_samplers": {}, #difficulty:PermutationSampler, so a player doesn't see a word twice until they've seen them all
+        "game_lines": [], #lines of the words played this game - weighted banks only avoid repeats within a game
+        "current_word": " ", #space indicates this is the first round
+        "word_line": 0, #word bank line of current_word, 0 between rounds
+        "number_rounds": number_rounds,
+        "current_round": 1,
+        "rounds_won": 0,
+        "mode": "e", #This will get updated in run()
+        "wrong_letters": "",
+        "display_letters" : "",
+        "max_strikes": max_strikes,
+        "current_strikes": 0,
+        "correct_letters": "",
+        "digits_in_word": 0,
+        "digits_guessed": 0,
+        "exit_requested": False,
+        "candidates": 0, #adversarial mode - bitset of the words (of the round's length) the word could still be
+        "letter_masks": {}, #letter:mask of its positions in current_word (bit p is position p)
+        "guessed_mask": 0, #letters guessed this round, bit i is LETTERS[i]
+        "revealed_mask": 0, #positions of current_word shown in display_letters
+    }
+
+def check_game_limits(number_rounds, max_strikes):
+    """Raises ValueError if the game's number of rounds or max strikes are too big to snapshot (pack_game_state)"""
+    if not 1 <= number_rounds <= MAX_ROUNDS:
+        raise ValueError(f"number of rounds must be from 1 to {MAX_ROUNDS}")
+    if not 0 <= max_strikes <= MAX_STRIKES:
+        raise ValueError(f"max strikes must be from 0 to {MAX_STRIKES}")
+
+class GameState:
+    """Compact game state for when there are lots of games at once (e.g. the server).  Has the same
+    keys as new_game_config() and supports config["key"] access, so it can be used anywhere the
+    config dictionary is.  __slots__ keeps it to a fixed size object instead of a dictionary."""
+    __slots__ = ("print_mode", "word_samplers", "game_lines", "current_word", "word_line", "number_rounds", "current_round", "rounds_won",
+        "mode", "wrong_letters", "display_letters", "max_strikes", "current_strikes", "correct_letters",
+        "digits_in_word", "digits_guessed", "exit_requested", "candidates", "letter_masks", "guessed_mask", "revealed_mask")
+
+    def __init__(self, number_rounds=3, max_strikes=5):
+        for key, value in new_game_config(number_rounds, max_strikes).items():
+            setattr(self, key, value)
+        self.print_mode = False
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+
+class HangmanEngine:
+    """Plays hangman games against a WordBank.  The game state is either the config dictionary
+    the command line game uses (so the two can share it) or a GameState.  recorder (a
+    replay.GameRecorder, or None) is told about each game, round and guess."""
+    __slots__ = ("bank", "config", "rng", "recorder")
+
+    def __init__(self, bank, config=None, rng=random, recorder=None):
+        self.bank = bank
+        self.config = config if config is not None else GameState()
+        self.rng = rng
+        self.recorder = recorder
+
+    @property
+    def game_over(self):
+        return self.config["exit_requested"] or self.config["current_round"] > self.config["number_rounds"]
+
+    def new_game(self, mode):
+        """Starts a new game in the given mode (p, r, e, m, h or a) and picks the first round's word"""
+        if get_mode_name(mode) == "unknown":
+            raise ValueError(f"Unknown mode {mode}")
+        config = self.config
+        update_config_after_round(config) #clears anything left over from an unfinished round
+        config["game_lines"].clear()
+        config["current_round"] = 1
+        config["rounds_won"] = 0
+        config["exit_requested"] = False
+        config["mode"] = mode
+        if self.recorder is not None:
+            self.recorder.game_started(mode)
+        self.start_round()
+
+    def start_round(self):
+        word = determine_round_word(self.config, self.bank, self.rng)
+        initialize_word_in_config(self.config, word)
+        if self.config["mode"] == ADVERSARIAL_MODE:
+            self.config["candidates"] = get_solver_index(self.bank).all_words(len(word))
+        if self.recorder is not None:
+            self.recorder.round_started(self.config["word_line"], len(word))
+        return word
+
+    @metrics.timed("guess")
+    def guess(self, user_input):
+        """Processes a guess (raw user input, only the first character is used) and returns a GuessResult.
+        When a round ends the next round's word is picked straight away."""
+        config = self.config
+        if self.game_over:
+            raise GameStateError("The game is over - call new_game() to start another")
+        (input_status, guess_status, value) = process_round_input(config, user_input, self.bank.alphabet)
+        if input_status == InputStatus.EXIT:
+            config["exit_requested"] = True
+            if self.recorder is not None:
+                self.recorder.game_ended()
+            return GuessResult(input_status, guess_status, value, game_over=True)
+        if input_status != InputStatus.VALID or guess_status == GuessStatus.DUPLICATE:
+            return GuessResult(input_status, guess_status, value)
+
+        if config["mode"] == ADVERSARIAL_MODE:
+            guess_status = choose_adversarial_family(config, get_solver_index(self.bank), value, self.rng)
+        update_config_after_guess(config, value)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.guessed(value, guess_status == GuessStatus.CORRECT)
+        won = config["digits_guessed"] == config["digits_in_word"]
+        if not won and config["current_strikes"] <= config["max_strikes"]:
+            return GuessResult(input_status, guess_status, value)
+
+        word = config["current_word"]
+        line = config["word_line"]
+        strikes = config["current_strikes"]
+        if won:
+            config["rounds_won"] += 1
+        if metrics.ENABLED:
+            metrics.count("rounds_won" if won else "rounds_lost")
+        update_config_after_round(config)
+        game_over = self.game_over
+        if recorder is not None:
+            recorder.round_ended(line, strikes, won, game_over)
+        if not game_over:
+            self.start_round()
+        return GuessResult(input_status, guess_status, value, True, won, word, game_over, strikes)
+
+    def state(self):
+        """Returns a snapshot of the visible game state (the word is only shown once the round is over)"""
+        config = self.config
+        return {"mode": config["mode"],
+            "current_round": config["current_round"],
+            "number_rounds": config["number_rounds"],
+            "rounds_won": config["rounds_won"],
+            "current_strikes": config["current_strikes"],
+            "max_strikes": config["max_strikes"],
+            "display_letters": config["display_letters"],
+            "wrong_letters": config["wrong_letters"],
+            "correct_letters": config["correct_letters"],
+            "game_over": self.game_over,
+        }
+
+    def abandon(self):
+        """Tells the recorder the game won't be played any further on this engine (it was evicted or
+        its player left) - a restored copy is recorded as a new game"""
+        if self.recorder is not None:
+            self.recorder.game_ended()
+
+    def snapshot(self):
+        """Returns the game state packed into bytes (see pack_game_state)"""
+        return pack_game_state(self.config, self.bank)
+
+    def restore(self, data):
+        """Replaces the game state with one from snapshot()"""
+        unpack_game_state(self.config, data, self.bank)
+        if self.recorder is not None:
+            config = self.config
+            self.recorder.restored(config["mode"], config["word_line"], config["digits_in_word"])
+
+
+def pack_game_state(config, bank):
+    """Packs the game state into a few dozen bytes - the current word as its word bank line, the guessed
+    letters as a mask over the bank's alphabet, the counters as small ints and each word sampler as its cursor.
+    What can be worked out again from those (the display letters, the adversarial candidates) isn't stored.
+    The order the wrong letters were guessed in isn't kept."""
+    samplers = config["word_samplers"]
+    cursors = [SNAPSHOT_SAMPLER.pack(code, *samplers[difficulty].cursor())
+        for code, difficulty in enumerate(SNAPSHOT_DIFFICULTIES) if difficulty in samplers]
+    lines = config["game_lines"]
+    flags = (EXIT_REQUESTED if config["exit_requested"] else 0) | (PRINT_MODE if config["print_mode"] else 0)
+    alphabet = bank.alphabet
+    if alphabet == LETTERS:
+        guessed = config["guessed_mask"]
+    else:
+        guessed = 0
+        for letter in config["correct_letters"] + config["wrong_letters"]:
+            guessed |= 1 << alphabet.index(letter)
+    mask_size = (len(alphabet) + 7) // 8
+    return b"".join([SNAPSHOT_HEADER.pack(SNAPSHOT_VERSION, config["mode"].encode("ascii"), config["number_rounds"],
+        config["current_round"], config["rounds_won"], config["max_strikes"], config["current_strikes"], flags, len(cursors),
+        len(lines), len(bank), config["word_line"], mask_size), guessed.to_bytes(mask_size, "little")] + cursors
+        + [struct.pack(f"<{len(lines)}I", *lines)])
+
+def unpack_game_state(config, data, bank):
+    """Unpacks pack_game_state() bytes into the config (or GameState).  The bank must be the one the
+    state was packed with - raises GameStateError if the data isn't a snapshot for a bank that size."""
+    try:
+        (version, mode, number_rounds, current_round, rounds_won, max_strikes, current_strikes, flags, num_samplers,
+            num_lines, bank_size, word_line, mask_size) = SNAPSHOT_HEADER.unpack_from(data, 0)
+    except struct.error as e:
+        raise GameStateError(f"Not a game snapshot: {e}")
+    if version != SNAPSHOT_VERSION or bank_size != len(bank) or mask_size != (len(bank.alphabet) + 7) // 8:
+        raise GameStateError("The snapshot is from a different version or word bank")
+    offset = SNAPSHOT_HEADER.size
+    guessed = int.from_bytes(data[offset:offset + mask_size], "little")
+    offset += mask_size
+    samplers = {}
+    try:
+        for _ in range(num_samplers):
+            code, seed, cycle, index = SNAPSHOT_SAMPLER.unpack_from(data, offset)
+            offset += SNAPSHOT_SAMPLER.size
+            start, end = bank.slot_range(SNAPSHOT_DIFFICULTIES[code])
+            samplers[SNAPSHOT_DIFFICULTIES[code]] = PermutationSampler.from_cursor(end - start + 1, (seed, cycle, index))
+        lines = list(struct.unpack_from(f"<{num_lines}I", data, offset))
+    except (struct.error, IndexError, ValueError) as e:
+        raise GameStateError(f"Not a game snapshot: {e}")
+
+    update_config_after_round(config) #clears the round, so it is set up the same way as a new round
+    config["mode"] = mode.decode("ascii")
+    config["number_rounds"] = number_rounds
+    config["current_round"] = current_round
+    config["rounds_won"] = rounds_won
+    config["max_strikes"] = max_strikes
+    config["exit_requested"] = bool(flags & EXIT_REQUESTED)
+    config["print_mode"] = bool(flags & PRINT_MODE)
+    config["word_samplers"] = samplers
+    config["game_lines"] = lines
+    if word_line:
+        word = bank.get_word(word_line)
+        initialize_word_in_config(config, word)
+        config["word_line"] = word_line
+        config["current_strikes"] = current_strikes
+        letters = [letter for i, letter in enumerate(bank.alphabet) if guessed >> i & 1]
+        config["guessed_mask"] = sum(LETTER_BITS.get(letter, 0) for letter in letters)
+        config["correct_letters"] = "".join(letter for letter in letters if letter in config["letter_masks"])
+        config["wrong_letters"] = "".join(letter for letter in letters if letter not in config["letter_masks"])
+        generate_display_letters(config)
+        if config["mode"] == ADVERSARIAL_MODE:
+            config["candidates"] = get_solver_index(bank).filter(config["display_letters"], config["wrong_letters"])
+
+
+def get_random_word_in_difficulty(bank, difficulty, rng=random):
+    """Returns a random word from the WordBank.  Anything other than easy, medium or hard uses the entire range"""
+    return bank.sample(difficulty, rng)
+
+@metrics.timed("word_selection")
+def determine_round_word(config, bank, rng=random):
+    difficulty = "e"
+    if config["mode"] == "e" or config["mode"] == "m" or config["mode"] == "h":
+        difficulty = get_mode_name(config["mode"])
+    elif config["mode"] == "p":
+        if config["current_round"] == 1:
+            difficulty = "easy"
+        elif config["current_round"] == 2:
+            difficulty = "medium"
+        else:
+            difficulty = "hard"
+    else:
+        difficulty = "random"
+    
+    if bank.weights is not None:
+        return get_weighted_word_in_difficulty(config, bank, difficulty, rng)
+    return get_unplayed_word_in_difficulty(config, bank, difficulty, rng)
+
+def get_unplayed_word_in_difficulty(config, bank, difficulty, rng=random):
+    """Returns the next word from the player's sampler for the difficulty.  Words don't repeat until the
+    player has had every word in the difficulty, then a new order starts.  The sampler is seeded from rng
+    the first time the difficulty is played (or when the bank's range for it changes size)."""
+    start, end = bank.slot_range(difficulty)
+    sampler = config["word_samplers"].get(difficulty)
+    if sampler is None or sampler.size != end - start + 1:
+        sampler = PermutationSampler(end - start + 1, rng.getrandbits(32))
+        config["word_samplers"][difficulty] = sampler
+    elif metrics.ENABLED and sampler.remaining() == 0:
+        metrics.count("word_sampler_cycles") #the player has had every word in the difficulty
+    config["word_line"] = bank.line_at(start + sampler.next())
+    return bank.get_word(config["word_line"])
+
+def get_weighted_word_in_difficulty(config, bank, difficulty, rng=random, max_draws=16):
+    """Returns a word from the difficulty picked in proportion to the bank's word weights.  Common words
+    come up a lot, so a permutation can't be used - instead the word is redrawn (at most max_draws
+    times) while it has already been played this game."""
+    for _ in range(max_draws):
+        line = bank.sample_weighted_line(difficulty, rng)
+        if line not in config["game_lines"]:
+            break
+        if metrics.ENABLED:
+            metrics.count("word_selection_redraws")
+    config["game_lines"].append(line)
+    config["word_line"] = line
+    return bank.get_word(line)
+
+def update_config_after_round(config):
+    """Updates the config dictinoary after a round"""
+    config["current_word"] = " "
+    config["word_line"] = 0
+    config["current_strikes"] = 0
+    config["display_letters"] = ""
+    config["wrong_letters"] = ""
+    config["current_round"] += 1
+    config["correct_letters"] = ""
+    config["digits_in_word"] = 0
+    config["digits_guessed"] = 0
+    config["candidates"] = 0
+    config["letter_masks"] = {}
+    config["guessed_mask"] = 0
+    config["revealed_mask"] = 0
+
+def choose_adversarial_family(config, index, letter, rng=random):
+    """Adversarial mode - the word isn't settled until it has to be.  Splits the words the round could
+    still be by where the letter appears (SolverIndex.partition) and keeps the largest family, a miss
+    winning ties.  The current word stays if it is in that family, otherwise a random word from the
+    family takes its place.  Returns the guess status against the (possibly new) current word."""
+    word = config["current_word"]
+    length = len(word)
+    families = index.partition(length, config["candidates"], letter)
+    mask = max(families, key=lambda family: (families[family].bit_count(), family == 0))
+    config["candidates"] = families[mask]
+    if mask != sum(1 << position for position, c in enumerate(word) if c == letter):
+        i = random_member(families[mask], rng)
+        config["current_word"] = index.get_word(length, i)
+        config["word_line"] = index.first_lines[length] + i
+        config["letter_masks"] = word_letter_masks(config["current_word"]) #the revealed positions are the same for the whole family
+    return GuessStatus.CORRECT if mask else GuessStatus.INCORRECT
+
+
+def update_config_after_guess(config, guess):
+    """Called after an incorrect or correct guess (not duplicate.  Updates the config accordingly.
+    The letter's position mask says where it is, so only those positions of the display change."""
+    config["guessed_mask"] |= LETTER_BITS.get(guess, 0)
+    mask = config["letter_masks"].get(guess, 0)
+    if not mask:
+        config["current_strikes"] += 1
+        config["wrong_letters"] += guess
+        return
+    config["correct_letters"] += guess
+    revealed = config["revealed_mask"] | mask
+    config["revealed_mask"] = revealed
+    config["digits_guessed"] = revealed.bit_count()
+    display = config["display_letters"]
+    if mask & (mask - 1): #more than one position
+        config["display_letters"] = "".join(guess if mask >> position & 1 else c for position, c in enumerate(display))
+    else:
+        position = mask.bit_length() - 1
+        config["display_letters"] = display[:position] + guess + display[position + 1:]
+
+def generate_display_letters(config):
+    """re-generates the display letters (and revealed mask) based on the current word and correctly guessed letters"""
+    letter_masks = config["letter_masks"]
+    revealed = 0
+    for letter in config["correct_letters"]:
+        revealed |= letter_masks.get(letter, 0)
+    config["revealed_mask"] = revealed
+    config["digits_guessed"] = revealed.bit_count()
+    config["display_letters"] = "".join(letter if revealed >> position & 1 else "_" for position, letter in enumerate(config["current_word"]))
+
+def word_letter_masks(word):
+    """Returns letter:mask of the positions the letter is at in the word"""
+    masks = {}
+    for position, letter in enumerate(word):
+        masks[letter] = masks.get(letter, 0) | 1 << position
+    return masks
+
+def initialize_word_in_config(config, word):
+    config["current_word"] = word
+    config["digits_in_word"] = len(config["current_word"])
+    config["letter_masks"] = word_letter_masks(word)
+    generate_display_letters(config)
+
+
+def get_mode_name(mode):
+    mode_names = {"p": "progressive", "r": "random", "e": "easy", "m": "medium", "h": "hard", "a": "adversarial"}
+    if mode in mode_names:
+        return mode_names[mode]
+    else:
+        return "unknown"
+
+def process_mode_selection(user_input):
+    """Processes the user input when at the mode selection step"""
+    valid_modes = "premha"
+    (status, value) = process_raw_input(user_input)
+    if status == InputStatus.EXIT:
+        return status, "Exiting..."
+    elif status == InputStatus.EMPTY:
+        return status, "Nothing was entered.  Please enter a valid mode - (P),(R),(E),(M),(H),(A) or number 0 to exit"
+    elif status == InputStatus.INVALID or value not in valid_modes:
+        return status, "Invalid entry.  Please enter a valid mode - (P),(R),(E),(M),(H),(A) or number 0 to exit"
+    else:
+        return status, value
+
+def process_round_input(config, user_input, alphabet=LETTERS):
+    """Processes the user letter guess input for the round.  Returns tuple(x3) 2 enum codes and either an error string or the guessed letter.
+    Letters outside the alphabet (the word bank's) are invalid, as no word can have them."""
+    (input_status, value) = process_raw_input(user_input)
+    if input_status != InputStatus.VALID:
+        if input_status == InputStatus.EXIT:
+            return input_status, GuessStatus.NONE, "Exiting..."
+        elif input_status == InputStatus.EMPTY:
+            return input_status, GuessStatus.NONE, "Nothing was entered."
+        elif input_status == InputStatus.INVALID:
+            return input_status, GuessStatus.NONE, "Invalid entry."
+    elif value not in alphabet:
+        return InputStatus.INVALID, GuessStatus.NONE, "That letter isn't used in this language."
+    else:
+        bit = LETTER_BITS.get(value)
+        if bit is not None:
+            duplicate = config["guessed_mask"] & bit
+        else: #letters of other alphabets aren't in the mask
+            duplicate = value in config["correct_letters"] or value in config["wrong_letters"]
+        if duplicate:
+            return input_status, GuessStatus.DUPLICATE, value
+        elif value in config["letter_masks"]:
+            return input_status, GuessStatus.CORRECT, value
+        else:
+            return input_status, GuessStatus.INCORRECT, value
+
+def process_raw_input(user_input):
+    """Processes the raw user input and returns a tuple (status, letter)"""
+    if len(user_input) == 0:
+        return InputStatus.EMPTY, ""
+    else:
+        if not user_input.isascii(): #so an accent typed as a combining mark joins its letter
+            user_input = unicodedata.normalize("NFC", user_input)
+        letter = user_input[0]
+        if letter == "0": #exit
+            return InputStatus.EXIT, ""
+        elif letter.isalpha():
+            return InputStatus.VALID, letter.lower()
+        else:
+            return InputStatus.INVALID, ""
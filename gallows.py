@@ -79,3 +79,7 @@ def create_gallows():
         ],
     }
     return gallows
+
+
+#built once - the frames never change, so there's no need to call create_gallows() every round
+GALLOWS = create_gallows()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+"""Generates puzzle packs offline - N different words streamed to a JSONL or compact binary file.
+
+Words are drawn with the PermutationSampler the game uses, over a difficulty's slots narrowed to
+the length and score constraints, so nothing repeats, memory doesn't grow with N and a seed always
+gives the same puzzles (for the same word bank and constraints).  Words handed out by earlier runs
+can be skipped with an issued file - one bit per word bank line - which each run adds its words to.
+
+    python3 generate.py -n 1000 --seed 2026-10-18 --issued issued.bits -o daily.jsonl
+    python3 generate.py -n 100000 -d hard --min-length 6 --max-length 9 --format binary -o pack.bin
+    python3 generate.py --read pack.bin        - prints a binary pack as JSONL
+
+Each JSONL line is one puzzle, e.g.
+
+    {"id": 0, "word": "crane", "line": 5123, "difficulty": "easy", "length": 5, "score": 812, "seed": 1804289383}
+
+with score only when the bank has a scores file and seed only with --puzzle-seeds.  The binary
+file is PACK_HEADER followed by one PUZZLE_RECORD per puzzle - words are stored as their word bank
+line, so reading a pack needs the bank it was made from.
+"""
+
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple, Optional
+
+from sampler import PermutationSampler
+from word_bank import DEFAULT_LOCALE, DIFFICULTIES, load_word_bank, locale_paths
+
+PACK_MAGIC = b"HMWP"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<4sHxxII") #magic, version, words in the bank, number of puzzles
+PUZZLE_RECORD = struct.Struct("<IBBHI") #word bank line, length, difficulty (index in DIFFICULTIES), score, seed
+NO_SEED = 0xFFFFFFFF #PUZZLE_RECORD seed without --puzzle-seeds - real seeds are 31 bits
+
+ISSUED_MAGIC = b"HMWI"
+ISSUED_VERSION = 1
+ISSUED_HEADER = struct.Struct("<4sHxxI") #magic, version, words in the bank
+
+BATCH = 4096 #puzzles per write
+
+
+class PuzzlePackError(Exception):
+    """Raised when a puzzle pack or issued file is not in the expected format or is for another word bank"""
+    pass
+
+
+class Puzzle(NamedTuple):
+    id: int
+    word: str
+    line: int #word bank line
+    difficulty: str
+    length: int
+    score: Optional[int] = None #difficulty score, None without a scores file
+    seed: Optional[int] = None
+
+
+class IssuedWords:
+    """Bitset of the word bank lines already handed out (bit line - 1) - a bit per word however many
+    puzzles have been generated"""
+
+    def __init__(self, size, bits=None):
+        self.size = size
+        self.bits = bytearray((size + 7) // 8) if bits is None else bits
+
+    @classmethod
+    def load(cls, path, size):
+        """Reads an issued file, or starts an empty one if path doesn't exist yet"""
+        if not os.path.exists(path):
+            return cls(size)
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            magic, version, count = ISSUED_HEADER.unpack_from(data, 0)
+        except struct.error:
+            raise PuzzlePackError(f"{path} is too small to be an issued file")
+        if magic != ISSUED_MAGIC or version != ISSUED_VERSION or len(data) != ISSUED_HEADER.size + (count + 7) // 8:
+            raise PuzzlePackError(f"{path} is not a version {ISSUED_VERSION} issued file")
+        if count != size:
+            raise PuzzlePackError(f"{path} is for a word bank of {count} words, not {size}")
+        return cls(size, bytearray(data[ISSUED_HEADER.size:]))
+
+    def __contains__(self, line):
+        return self.bits[(line - 1) >> 3] >> ((line - 1) & 7) & 1
+
+    def add(self, line):
+        self.bits[(line - 1) >> 3] |= 1 << ((line - 1) & 7)
+
+    def count(self):
+        return sum(byte.bit_count() for byte in self.bits)
+
+    def save(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(ISSUED_HEADER.pack(ISSUED_MAGIC, ISSUED_VERSION, self.size))
+            f.write(self.bits)
+        os.replace(temp_path, path) #a run that dies part way leaves the last complete file
+
+
+def constrained_slots(bank, difficulty, min_length=None, max_length=None, min_score=None, max_score=None):
+    """Returns (first slot, last slot) of the difficulty narrowed by the constraint the bank is ordered by -
+    length when it goes by length, score when it goes by score.  The other one is checked word by word.
+    The range is empty (first > last) when no slot can meet the constraints."""
+    start, end = bank.slot_range(difficulty)
+    if bank.scores is None:
+        words = bank.words
+        if min_length is not None:
+            i = bisect_left(words.lengths, min_length)
+            start = max(start, words.first_lines[i] if i < len(words.lengths) else end + 1)
+        if max_length is not None:
+            i = bisect_right(words.lengths, max_length)
+            end = min(end, words.first_lines[i] - 1 if i < len(words.lengths) else len(words))
+    else:
+        order = bank.scores.order
+        scores = bank.scores.scores
+        slots = range(start, end + 1)
+        score_of = lambda slot: scores[order[slot - 1] - 1]
+        if min_score is not None:
+            start = slots[0] + bisect_left(slots, min_score, key=score_of)
+        if max_score is not None:
+            end = slots[0] + bisect_right(slots, max_score, key=score_of) - 1
+    return start, end
+
+def generate_puzzles(bank, count, difficulty="random", seed=0, min_length=None, max_length=None, min_score=None,
+        max_score=None, issued=None, puzzle_seeds=False):
+    """Yields up to count Puzzles with different words - fewer when the constraints run out of words.
+    Words in issued (IssuedWords) are skipped and the ones yielded are added to it.  A word that is on
+    more than one line is only used from its first line (the copies are next to each other)."""
+    if bank.scores is None and (min_score is not None or max_score is not None):
+        raise ValueError("The word bank has no scores file to constrain the score by")
+    start, end = constrained_slots(bank, difficulty, min_length, max_length, min_score, max_score)
+    if start > end or count <= 0:
+        return
+    brackets = [] #(last slot, difficulty) - the ranges don't overlap, so a slot's difficulty is the first that ends at or after it
+    for diff in DIFFICULTIES:
+        try:
+            brackets.append((bank.slot_range(diff)[1], diff))
+        except ValueError:
+            pass
+    brackets.sort()
+    ends = [last for last, diff in brackets]
+    sampler = PermutationSampler(end - start + 1, seed)
+    seeds = random.Random(f"{seed}:puzzle seeds") if puzzle_seeds else None
+    scores = None if bank.scores is None else bank.scores.scores
+    produced = 0
+    while produced < count and sampler.remaining():
+        slot = start + sampler.next()
+        line = bank.line_at(slot)
+        if issued is not None and line in issued:
+            continue
+        word = bank.get_word(line)
+        if line > 1 and bank.get_word(line - 1) == word: #banks built before word_parse.py dropped duplicates
+            continue
+        length = len(word)
+        if (min_length is not None and length < min_length) or (max_length is not None and length > max_length):
+            continue
+        score = None
+        if scores is not None:
+            score = scores[line - 1]
+            if (min_score is not None and score < min_score) or (max_score is not None and score > max_score):
+                continue
+        if issued is not None:
+            issued.add(line)
+        yield Puzzle(produced, word, line, brackets[bisect_left(ends, slot)][1], length, score,
+            None if seeds is None else seeds.getrandbits(31))
+        produced += 1
+
+def format_puzzle(puzzle):
+    """The puzzle as a JSON line - built by hand, as words are only letters and never need escaping"""
+    line = '{{"id": {}, "word": "{}", "line": {}, "difficulty": "{}", "length": {}'.format(puzzle.id, puzzle.word, puzzle.line,
+        puzzle.difficulty, puzzle.length)
+    if puzzle.score is not None:
+        line += ', "score": {}'.format(puzzle.score)
+    if puzzle.seed is not None:
+        line += ', "seed": {}'.format(puzzle.seed)
+    return line + "}\n"
+
+def write_jsonl(puzzles, f):
+    """Writes the puzzles to a text file a batch at a time.  Returns the number written"""
+    written = 0
+    batch = []
+    for puzzle in puzzles:
+        batch.append(format_puzzle(puzzle))
+        if len(batch) >= BATCH:
+            f.write("".join(batch))
+            written += len(batch)
+            batch.clear()
+    f.write("".join(batch))
+    return written + len(batch)
+
+def write_pack(puzzles, f, bank_size):
+    """Writes the puzzles to a binary file (seekable - the count in the header is filled in at the end).
+    Returns the number written"""
+    header_offset = f.tell()
+    f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, bank_size, 0))
+    written = 0
+    batch = []
+    for puzzle in puzzles:
+        batch.append(PUZZLE_RECORD.pack(puzzle.line, puzzle.length, DIFFICULTIES.index(puzzle.difficulty),
+            0 if puzzle.score is None else puzzle.score, NO_SEED if puzzle.seed is None else puzzle.seed))
+        if len(batch) >= BATCH:
+            f.write(b"".join(batch))
+            written += len(batch)
+            batch.clear()
+    f.write(b"".join(batch))
+    written += len(batch)
+    end = f.tell()
+    f.seek(header_offset)
+    f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, bank_size, written))
+    f.seek(end)
+    return written
+
+def read_pack(path, bank):
+    """Yields the Puzzles in a binary pack, a batch of records at a time.  bank must be the one the pack was made from"""
+    with open(path, "rb") as f:
+        try:
+            magic, version, bank_size, count = PACK_HEADER.unpack(f.read(PACK_HEADER.size))
+        except struct.error:
+            raise PuzzlePackError(f"{path} is too small to be a puzzle pack")
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise PuzzlePackError(f"{path} is not a version {PACK_VERSION} puzzle pack")
+        if bank_size != len(bank):
+            raise PuzzlePackError(f"{path} is for a word bank of {bank_size} words, not {len(bank)}")
+        has_scores = bank.scores is not None
+        puzzle_id = 0
+        while puzzle_id < count:
+            data = f.read(PUZZLE_RECORD.size * min(BATCH, count - puzzle_id))
+            if len(data) % PUZZLE_RECORD.size or not data:
+                raise PuzzlePackError(f"{path} ends part way through its puzzles")
+            for line, length, difficulty, score, seed in PUZZLE_RECORD.iter_unpack(data):
+                yield Puzzle(puzzle_id, bank.get_word(line), line, DIFFICULTIES[difficulty], length,
+                    score if has_scores else None, None if seed == NO_SEED else seed)
+                puzzle_id += 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Streams puzzles with different words to a JSONL or binary file")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="puzzles to generate")
+    parser.add_argument("-d", "--difficulty", default="random", choices=DIFFICULTIES + ("random",))
+    parser.add_argument("--seed", default="0", help="same seed, bank and constraints - same puzzles")
+    parser.add_argument("--min-length", type=int)
+    parser.add_argument("--max-length", type=int)
+    parser.add_argument("--min-score", type=int, help="lowest difficulty score (needs the scores file)")
+    parser.add_argument("--max-score", type=int, help="highest difficulty score (needs the scores file)")
+    parser.add_argument("--issued", help="bitset file of words handed out before - they are skipped and this run's are added")
+    parser.add_argument("--puzzle-seeds", action="store_true", help="give every puzzle its own seed too")
+    parser.add_argument("--format", default="jsonl", choices=("jsonl", "binary"))
+    parser.add_argument("-o", "--output", default="-", help="file to write (- for stdout, JSONL only)")
+    parser.add_argument("--locale", default=DEFAULT_LOCALE, help="language of the word bank")
+    parser.add_argument("--read", metavar="PACK", help="print a binary pack as JSONL instead of generating")
+    args = parser.parse_args()
+
+    try:
+        paths = locale_paths(args.locale)
+        bank = load_word_bank(paths["bank"], paths["bin"], scores_path=paths["scores"])
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
+    if args.read:
+        try:
+            write_jsonl(read_pack(args.read, bank), sys.stdout)
+        except (OSError, PuzzlePackError) as e:
+            parser.error(str(e))
+        return
+    if args.format == "binary" and args.output == "-":
+        parser.error("binary packs need an output file")
+
+    try:
+        issued = IssuedWords.load(args.issued, len(bank)) if args.issued else None
+    except (OSError, PuzzlePackError) as e:
+        parser.error(str(e))
+    puzzles = generate_puzzles(bank, args.count, args.difficulty, args.seed, args.min_length, args.max_length,
+        args.min_score, args.max_score, issued, args.puzzle_seeds)
+    start = time.perf_counter()
+    try:
+        if args.output == "-":
+            written = write_jsonl(puzzles, sys.stdout)
+        elif args.format == "jsonl":
+            with open(args.output, "w", encoding="utf-8", buffering=1 << 20) as f:
+                written = write_jsonl(puzzles, f)
+        else:
+            with open(args.output, "wb", buffering=1 << 20) as f:
+                written = write_pack(puzzles, f, len(bank))
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = time.perf_counter() - start
+    print("Generated {} puzzles in {:.2f}s ({:,.0f} puzzles/s)".format(written, elapsed, written / max(elapsed, 1e-9)), file=sys.stderr)
+    if issued is not None:
+        issued.save(args.issued)
+        print("{} of {} words issued so far".format(issued.count(), len(bank)), file=sys.stderr)
+    if written < args.count:
+        print("Only {} words meet the constraints{}".format(written, " and haven't been issued" if issued is not None else ""), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Optional hot path metrics - counters and latency histograms, kept per process.
+
+Off unless the HANGMAN_METRICS environment variable is set when the game modules are imported.
+When off, timed() hands back the function it was given unchanged and the few counters in loops are
+behind "if metrics.ENABLED", so the game runs as if this module wasn't there.  When on, each process
+updates its own plain dictionaries (no locks - the updates are single operations under the GIL) and
+can export them in the Prometheus text format:
+
+    HANGMAN_METRICS=1 python3 hangman.py                 - prints the metrics to stderr at exit
+    HANGMAN_METRICS=metrics.prom python3 server.py       - writes them to metrics.prom at exit
+"""
+
+import os
+import sys
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+
+SETTING = os.environ.get("HANGMAN_METRICS", "")
+ENABLED = SETTING not in ("", "0")
+PREFIX = "hangman_"
+BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0) #histogram upper bounds in seconds
+
+_counters = {} #name:count
+_histograms = {} #name:[count per bucket..., count above the last bucket, sum of the seconds]
+
+
+def count(name, amount=1):
+    _counters[name] = _counters.get(name, 0) + amount
+
+def observe(name, seconds):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+    histogram[bisect_left(BUCKETS, seconds)] += 1
+    histogram[-1] += seconds
+
+def timed(name):
+    """Decorator that records how long each call takes in the name histogram - does nothing when metrics are off"""
+    def decorate(function):
+        if not ENABLED:
+            return function
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(name, perf_counter() - start)
+        return wrapper
+    return decorate
+
+def reset():
+    _counters.clear()
+    _histograms.clear()
+
+def export_prometheus():
+    """Returns the counters and histograms in the Prometheus text exposition format"""
+    lines = []
+    for name in sorted(_counters):
+        metric = PREFIX + name + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {_counters[name]}")
+    for name in sorted(_histograms):
+        metric = PREFIX + name + "_seconds"
+        histogram = _histograms[name]
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, histogram):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+        cumulative += histogram[len(BUCKETS)]
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"{metric}_sum {histogram[-1]:.9f}")
+        lines.append(f"{metric}_count {cumulative}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+def dump():
+    """Writes the metrics where HANGMAN_METRICS says - stderr for 1, otherwise the file it names"""
+    if not ENABLED:
+        return
+    text = export_prometheus()
+    if SETTING == "1":
+        sys.stderr.write(text)
+        return
+    temp_path = SETTING + ".tmp"
+    with open(temp_path, "w") as f:
+        f.write(text)
+    os.replace(temp_path, SETTING) #so a scraper never reads half a file
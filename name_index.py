@@ -0,0 +1,132 @@
+"""Memory mapped names index used by word_parse.py to filter names out of the word bank.
+
+Instead of loading the first and last names files into two Python sets on every build, the names
+are written once to a packed file with an open addressing hash table over them:
+    header   - magic, version, number of names, hash table size
+    offsets  - number of names + 1 uint32 offsets into the names data
+    flags    - one byte per name: 1 = first name, 2 = last name
+    table    - hash table size uint32 slots, name number + 1 (0 is an empty slot)
+    names    - the UTF-8 encoded names, sorted by their bytes, packed back to back
+
+Lookups hash the word with crc32 and probe the memory mapped table (usually a single compare),
+so opening the index is instant, the pages are shared between the build processes and no per
+name Python objects are created.
+"""
+
+import mmap
+import struct
+from os import path
+from zlib import crc32
+
+MAGIC = b"HMNI"
+VERSION = 1
+HEADER = struct.Struct("<4sHII") #magic, version, number of names, hash table size
+FIRST_NAME = 1
+LAST_NAME = 2
+
+
+class NameIndexError(Exception):
+    """Raised when the names index file is missing or not in the expected format"""
+    pass
+
+
+def read_names(names_path):
+    """Yields the names in a names file the same way word_parse.create_names reads them (stripped and lowercased)"""
+    with open(names_path, "r") as f:
+        for line in f:
+            yield line.strip().lower()
+
+def build_name_index(first_path, last_path, index_path):
+    """Writes the names index for the first and last names files"""
+    flags = {}
+    for names_path, flag in ((first_path, FIRST_NAME), (last_path, LAST_NAME)):
+        for name in read_names(names_path):
+            key = name.encode("utf-8")
+            flags[key] = flags.get(key, 0) | flag
+    names = sorted(flags)
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name))
+    table_size = 1
+    while table_size < len(names) * 2: #at most half full keeps the probe sequences short
+        table_size *= 2
+    mask = table_size - 1
+    table = [0] * table_size
+    for i, name in enumerate(names):
+        slot = crc32(name) & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = i + 1
+    with open(index_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(names), table_size))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(bytes(flags[name] for name in names))
+        f.write(struct.pack(f"<{table_size}I", *table))
+        f.write(b"".join(names))
+
+def name_index_is_current(first_path, last_path, index_path):
+    """True when the index exists and is newer than both names files"""
+    if not path.exists(index_path):
+        return False
+    built = path.getmtime(index_path)
+    return built >= path.getmtime(first_path) and built >= path.getmtime(last_path)
+
+def ensure_name_index(first_path, last_path, index_path):
+    """Builds the names index if it is missing or older than the names files"""
+    if not name_index_is_current(first_path, last_path, index_path):
+        build_name_index(first_path, last_path, index_path)
+
+
+class NameIndex:
+    """Read only, memory mapped view of a names index file"""
+
+    def __init__(self, index_path):
+        try:
+            with open(index_path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise NameIndexError(f"Unable to open the names index {index_path}: {e}")
+        if len(self._mm) < HEADER.size:
+            self._mm.close()
+            raise NameIndexError(f"{index_path} is too small to be a names index")
+        magic, version, count, table_size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise NameIndexError(f"{index_path} is not a version {VERSION} names index")
+        self.count = count
+        self._mask = table_size - 1
+        offsets_start = HEADER.size
+        self._flags_start = offsets_start + (count + 1) * 4
+        table_start = self._flags_start + count
+        self._names_start = table_start + table_size * 4
+        #memoryviews over the mapped pages - no copies (native uint32, so this assumes a little endian machine)
+        self._offsets = memoryview(self._mm)[offsets_start:self._flags_start].cast("I")
+        self._table = memoryview(self._mm)[table_start:self._names_start].cast("I")
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, word):
+        """Returns the FIRST_NAME/LAST_NAME flags for the word (0 when it isn't a name).  The word is
+        matched exactly like the names sets were, so it is not lowercased here."""
+        key = word.encode("utf-8")
+        offsets = self._offsets
+        table = self._table
+        start = self._names_start
+        slot = crc32(key) & self._mask
+        while True:
+            entry = table[slot]
+            if entry == 0:
+                return 0
+            if self._mm[start + offsets[entry - 1]:start + offsets[entry]] == key:
+                return self._mm[self._flags_start + entry - 1]
+            slot = (slot + 1) & self._mask
+
+    def is_name(self, word):
+        """Single lookup for both the first and last names"""
+        return self.lookup(word) != 0
+
+    def close(self):
+        self._offsets.release()
+        self._table.release()
+        self._mm.close()
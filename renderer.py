@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""Terminal renderer that only redraws what changed.
+
+print_round() clears the screen with blank lines and prints the whole board every guess.  The
+TerminalRenderer keeps the lines currently on screen, and for each update uses ANSI cursor
+positioning to rewrite just the lines that differ (usually the gallows limb, the word line or the
+incorrect letters line), all in one buffered write.
+
+    python3 renderer.py    - compares the bytes written per guess with print_round()
+"""
+
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+import metrics
+from engine import get_mode_name
+from gallows import GALLOWS
+
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+CLEAR_LINE = "\x1b[K"
+GALLOWS_ROW = 5 #the board lines above the gallows are the title, a blank, the wins line and a blank
+MESSAGE_ROW = GALLOWS_ROW + len(GALLOWS[0]) + 4
+PROMPT_ROW = MESSAGE_ROW + 1
+
+
+def move_to(row):
+    return "\x1b[{};1H".format(row)
+
+def supports_ansi(stream=sys.stdout):
+    """True when the stream is a terminal that understands cursor positioning"""
+    return stream.isatty() and os.environ.get("TERM", "") not in ("", "dumb")
+
+def board_lines(config, message=""):
+    """The board print_round() prints, as a list of lines (row 1 first), plus the message row"""
+    lost = 0 if config["current_round"] == 1 else config["current_round"] - config["rounds_won"] - 1
+    lines = ["Round {} of {} - {} mode".format(config["current_round"], config["number_rounds"], get_mode_name(config["mode"])),
+        "",
+        "Wins: {}  Losses: {}".format(config["rounds_won"], lost),
+        ""]
+    lines.extend(GALLOWS[min(config["current_strikes"], len(GALLOWS) - 1)])
+    lines.extend(["Word:  " + " ".join(config["display_letters"]),
+        "",
+        "Incorrect: " + "".join(config["wrong_letters"]),
+        "",
+        message])
+    return lines
+
+
+class TerminalRenderer:
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.lines = None #what is on screen now, None until the first full draw
+        self.bytes_written = 0
+        self.updates = 0
+
+    def write(self, text):
+        self.out.write(text)
+        self.out.flush()
+        self.bytes_written += len(text.encode("utf-8"))
+        self.updates += 1
+
+    @metrics.timed("render")
+    def render(self, config, message=""):
+        """Draws the board, rewriting only the lines that changed since the last render.  Leaves the
+        cursor at the start of an empty prompt line, ready for input()"""
+        lines = board_lines(config, message)
+        if self.lines is None:
+            parts = [CLEAR_SCREEN, (CLEAR_LINE + "\n").join(lines), CLEAR_LINE]
+        else:
+            parts = [move_to(row) + line + CLEAR_LINE for row, (line, old) in enumerate(zip(lines, self.lines), 1) if line != old]
+        self.lines = lines
+        parts.append(move_to(PROMPT_ROW) + CLEAR_LINE)
+        self.write("".join(parts))
+
+    def message(self, text):
+        """Shows a message under the board without redrawing anything else"""
+        if self.lines is None:
+            self.write(text + "\n")
+            return
+        self.lines[-1] = text
+        self.write(move_to(MESSAGE_ROW) + text + CLEAR_LINE + move_to(PROMPT_ROW) + CLEAR_LINE)
+
+    def finish(self):
+        """Moves the cursor below the board so normal printing can carry on"""
+        if self.lines is not None:
+            self.write(move_to(PROMPT_ROW + 1))
+            self.lines = None
+
+
+def measure_bytes_per_guess(games=200, seed=0):
+    """Plays solver games and returns (print_round bytes per guess, renderer bytes per guess)"""
+    import random
+    from engine import HangmanEngine
+    from hangman import print_round
+    from solver import HangmanSolver, SolverIndex
+    from word_bank import load_word_bank
+
+    bank = load_word_bank("hangman_word_bank", "hangman_word_bank.bin")
+    solver = HangmanSolver(SolverIndex(bank))
+    engine = HangmanEngine(bank, rng=random.Random(seed))
+    config = engine.config
+    full = io.StringIO()
+    renderer = TerminalRenderer(io.StringIO())
+    guesses = 0
+    for _ in range(games):
+        engine.new_game("r")
+        while not engine.game_over:
+            #let the solver pick the letter, then draw the board the way play_round does before each guess
+            with redirect_stdout(full):
+                print_round(config, GALLOWS)
+            renderer.render(config)
+            length = config["digits_in_word"]
+            candidates = solver.index.filter(config["display_letters"], config["wrong_letters"])
+            guessed = set(config["correct_letters"]) | set(config["wrong_letters"])
+            engine.guess(solver.next_guess(length, candidates, guessed))
+            guesses += 1
+    return len(full.getvalue().encode("utf-8")) / guesses, renderer.bytes_written / guesses
+
+def main():
+    full, diff = measure_bytes_per_guess()
+    print("print_round:       {:.0f} bytes per guess".format(full))
+    print("TerminalRenderer:  {:.0f} bytes per guess ({:.0%} of print_round)".format(diff, diff / full))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+"""Append-only binary log of played games, and a streaming reader that aggregates it.
+
+Layout (all integers little endian):
+    header  - magic, version, words in the bank (the lines in the events are that bank's lines)
+    blocks  - one per batch: writer id, number of events, crc32 of the events, then the events
+
+Every event is EVENT - 8 bytes of game id, then the kind (3 bits), a small value (8 bits) and a
+bigger value (21 bits - enough for any code point, and for banks of up to 2 million words):
+
+    kind        small                               value
+    GAME        mode letter (+ RESTORED if the game  -
+                was restored from a snapshot)
+    ROUND       word length                         word bank line
+    RESUMED     word length                         word bank line - a restored game part way through its round
+    GUESS       HIT or 0 for a miss                 letter (its code point)
+    WON / LOST  strikes (+ GAME_OVER on the last    word bank line (the final word in adversarial mode)
+                round)
+    ENDED       -                                   -  the game stopped before its last round (the player
+                                                       exited, or the server evicted or parked it)
+
+Game ids are per writer, so a game is (writer id, game id).  Every game ends with a GAME_OVER round
+or ENDED, so a reader only keeps the games still being played.  Each block is written with one
+O_APPEND write, so several processes can append to the same log without their events getting mixed up.
+
+An engine records its games with HangmanEngine(bank, config, rng, recorder=log.recorder()).  The
+events are packed into an in memory batch and a full batch is written by a background thread, so
+the game's thread never waits on the file - the last partial batch is lost if the process dies
+without close().
+
+    python3 replay.py games.log                 - totals, strikes by word length, hardest words, wrong first guesses
+    python3 replay.py games.log --json stats.json --min-rounds 50
+"""
+
+import argparse
+import json
+import os
+import queue
+import struct
+import threading
+from collections import Counter
+from zlib import crc32
+
+from word_bank import DEFAULT_LOCALE, BinaryWordBankError, locale_paths, open_word_bank
+
+LOG_MAGIC = b"HMRL"
+LOG_VERSION = 2
+LOG_HEADER = struct.Struct("<4sHxxI") #magic, version, words in the bank
+BLOCK_HEADER = struct.Struct("<III") #writer id, number of events, crc32 of the events
+EVENT = struct.Struct("<II") #game id, then kind | small value << SMALL_SHIFT | value << VALUE_SHIFT
+SMALL_SHIFT = 3
+VALUE_SHIFT = 11
+MAX_VALUE = (1 << 21) - 1
+
+GAME = 1 #event kinds
+ROUND = 2
+RESUMED = 3
+GUESS = 4
+ENDED = 5
+WON = 6
+LOST = 7
+RESTORED = 0x80 #GAME flag
+HIT = 1 #GUESS small value
+GAME_OVER = 0x80 #WON/LOST flag - the rest of small is the strikes
+
+
+class ReplayLogError(Exception):
+    """Raised when a replay log is not in the expected format or is for a different word bank"""
+    pass
+
+
+def open_log(path, bank_size):
+    """Opens the log for appending (a file descriptor), writing the header first if the log is new"""
+    if bank_size > MAX_VALUE:
+        raise ReplayLogError(f"Can't record games over a bank of more than {MAX_VALUE:,} words")
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        os.write(fd, LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, bank_size))
+        os.close(fd)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            if read_header(f, path) != bank_size:
+                raise ReplayLogError(f"{path} is the log of a different word bank")
+    return os.open(path, os.O_WRONLY | os.O_APPEND)
+
+def read_header(f, path):
+    """Reads the log header and returns the number of words in the log's bank"""
+    try:
+        magic, version, bank_size = LOG_HEADER.unpack(f.read(LOG_HEADER.size))
+    except struct.error:
+        raise ReplayLogError(f"{path} is too small to be a replay log")
+    if magic != LOG_MAGIC or version != LOG_VERSION:
+        raise ReplayLogError(f"{path} is not a version {LOG_VERSION} replay log")
+    return bank_size
+
+
+class ReplayLog:
+    """Appends game events to a log file a batch at a time from a background thread"""
+
+    def __init__(self, path, bank_size, batch_events=4096):
+        self.path = path
+        self.batch_events = batch_events
+        self.writer_id = int.from_bytes(os.urandom(4), "little")
+        self._fd = open_log(path, bank_size)
+        self._events = bytearray()
+        self._count = 0 #events in the batch
+        self._next_game = 0
+        self._queue = queue.SimpleQueue() #blocks for the writer thread - None to stop, an Event to signal
+        self._thread = threading.Thread(target=self._write_blocks, name="replay log writer", daemon=True)
+        self._thread.start()
+
+    def recorder(self):
+        """Returns a GameRecorder to give an engine"""
+        return GameRecorder(self)
+
+    def new_game_id(self):
+        game = self._next_game
+        self._next_game = (game + 1) & 0xFFFFFFFF
+        return game
+
+    def add(self, kind, small, game, value):
+        self._events += EVENT.pack(game, kind | small << SMALL_SHIFT | value << VALUE_SHIFT)
+        self._count += 1
+        if self._count >= self.batch_events:
+            self.flush()
+
+    def flush(self):
+        """Hands the batch to the writer thread - returns straight away"""
+        if self._count:
+            events = bytes(self._events)
+            self._queue.put(BLOCK_HEADER.pack(self.writer_id, self._count, crc32(events)) + events)
+            self._events.clear()
+            self._count = 0
+
+    def sync(self):
+        """Flushes and waits until everything so far is written"""
+        self.flush()
+        written = threading.Event()
+        self._queue.put(written)
+        written.wait()
+
+    def _write_blocks(self):
+        while True:
+            block = self._queue.get()
+            if block is None:
+                return
+            if isinstance(block, threading.Event):
+                block.set()
+                continue
+            os.write(self._fd, block) #one write per block - appends from other processes land between blocks
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        os.close(self._fd)
+
+
+class GameRecorder:
+    """The engine hook - the engine calls these as its games go, and they add events to the log"""
+    __slots__ = ("log", "game", "live")
+
+    def __init__(self, log):
+        self.log = log
+        self.game = 0
+        self.live = False #True until the game's last round or ENDED
+
+    def game_started(self, mode):
+        self.game_ended() #an unfinished game the new one replaces
+        self.game = self.log.new_game_id()
+        self.live = True
+        self.log.add(GAME, ord(mode), self.game, 0)
+
+    def round_started(self, line, length):
+        self.log.add(ROUND, min(length, 255), self.game, line)
+
+    def guessed(self, letter, correct):
+        self.log.add(GUESS, HIT if correct else 0, self.game, ord(letter))
+
+    def round_ended(self, line, strikes, won, game_over):
+        self.log.add(WON if won else LOST, min(strikes, 127) | (GAME_OVER if game_over else 0), self.game, line)
+        if game_over:
+            self.live = False
+
+    def game_ended(self):
+        """The game won't be played any further (under this id) - does nothing if it already finished"""
+        if self.live:
+            self.log.add(ENDED, 0, self.game, 0)
+            self.live = False
+
+    def restored(self, mode, line, length):
+        """A game was restored from a snapshot - line is 0 between rounds"""
+        self.game_ended()
+        self.game = self.log.new_game_id()
+        self.live = True
+        self.log.add(GAME, ord(mode) | RESTORED, self.game, 0)
+        if line:
+            self.log.add(RESUMED, min(length, 255), self.game, line)
+
+
+class ReplayReader:
+    """Reads a replay log a block at a time.  A block with a bad checksum is skipped and a partly
+    written block at the end (a writer that died part way) ends the log."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.bank_size = read_header(f, path)
+        self.bad_blocks = 0
+        self.truncated = False
+
+    def blocks(self):
+        """Yields (writer id, events bytes) for each good block"""
+        with open(self.path, "rb") as f:
+            f.seek(LOG_HEADER.size)
+            while True:
+                header = f.read(BLOCK_HEADER.size)
+                if not header:
+                    return
+                if len(header) < BLOCK_HEADER.size:
+                    self.truncated = True
+                    return
+                writer, count, checksum = BLOCK_HEADER.unpack(header)
+                events = f.read(count * EVENT.size)
+                if len(events) < count * EVENT.size:
+                    self.truncated = True
+                    return
+                if crc32(events) != checksum:
+                    self.bad_blocks += 1
+                    continue
+                yield writer, events
+
+
+def new_aggregate():
+    return {"blocks": 0,
+        "events": 0,
+        "writers": set(),
+        "games": 0,
+        "rounds": 0,
+        "rounds_won": 0,
+        "guesses": 0,
+        "modes": {}, #mode:[rounds, rounds won]
+        "lengths": {}, #word length:[rounds, rounds won, strikes]
+        "words": {}, #word bank line:[rounds, rounds won, strikes]
+        "first_misses": Counter(), #letter:rounds whose first guess was that letter and a miss
+        "first_guesses": 0,
+    }
+
+def aggregate(reader):
+    """Streams through the log and returns the aggregates.  Memory goes with the words in the bank
+    and the games in progress, not the size of the log - a game's state is dropped at its last round
+    or when it ends early."""
+    totals = new_aggregate()
+    live = {} #(writer id, game id):[mode, word length, guesses this round]
+    modes = totals["modes"]
+    lengths = totals["lengths"]
+    words = totals["words"]
+    first_misses = totals["first_misses"]
+    for writer, events in reader.blocks():
+        totals["blocks"] += 1
+        totals["writers"].add(writer)
+        totals["events"] += len(events) // EVENT.size
+        for game, packed in EVENT.iter_unpack(events):
+            kind = packed & 7
+            small = packed >> SMALL_SHIFT & 0xFF
+            value = packed >> VALUE_SHIFT
+            if kind == GUESS:
+                totals["guesses"] += 1
+                state = live.get((writer, game))
+                if state is not None:
+                    if state[2] == 0:
+                        totals["first_guesses"] += 1
+                        if small != HIT:
+                            first_misses[value] += 1
+                    state[2] += 1
+            elif kind == WON or kind == LOST:
+                won = kind == WON
+                strikes = small & ~GAME_OVER
+                totals["rounds"] += 1
+                totals["rounds_won"] += won
+                entry = words.get(value)
+                if entry is None:
+                    entry = words[value] = [0, 0, 0]
+                entry[0] += 1
+                entry[1] += won
+                entry[2] += strikes
+                state = live.pop((writer, game), None) if small & GAME_OVER else live.get((writer, game))
+                if state is not None:
+                    mode = modes.setdefault(state[0], [0, 0])
+                    mode[0] += 1
+                    mode[1] += won
+                    length = lengths.setdefault(state[1], [0, 0, 0])
+                    length[0] += 1
+                    length[1] += won
+                    length[2] += strikes
+            elif kind == ROUND or kind == RESUMED:
+                state = live.get((writer, game))
+                if state is not None:
+                    state[1] = small
+                    state[2] = 0 if kind == ROUND else 1 #the first guess of a resumed round was before the snapshot
+            elif kind == GAME:
+                live[(writer, game)] = [chr(small & ~RESTORED), 0, 0]
+                if not small & RESTORED:
+                    totals["games"] += 1
+            elif kind == ENDED:
+                live.pop((writer, game), None)
+    totals["games_in_progress"] = len(live)
+    return totals
+
+def hardest_words(totals, min_rounds=20, count=20):
+    """Returns [(line, rounds, rounds won, strikes)] of the words with the lowest win rate over at least min_rounds rounds"""
+    played = [(line, *entry) for line, entry in totals["words"].items() if entry[0] >= min_rounds]
+    played.sort(key=lambda word: (word[2] / word[1], -word[3] / word[1]))
+    return played[:count]
+
+def load_log_bank(bank_size, locale=DEFAULT_LOCALE):
+    """Returns the locale's WordBank if it is the one the log was written against, otherwise None (lines are shown instead)"""
+    paths = locale_paths(locale)
+    try:
+        bank = open_word_bank(paths["bank"], paths["bin"])
+    except (OSError, BinaryWordBankError):
+        return None
+    return bank if len(bank) == bank_size else None
+
+def print_report(totals, reader, bank=None, min_rounds=20, top=20):
+    name = (lambda line: bank.get_word(line)) if bank is not None else (lambda line: f"line {line}")
+    rounds = max(totals["rounds"], 1)
+    print("{:,} games, {:,} rounds ({:.1%} won), {:,} guesses - {:,} events in {:,} blocks from {} writers".format(totals["games"],
+        totals["rounds"], totals["rounds_won"] / rounds, totals["guesses"], totals["events"], totals["blocks"], len(totals["writers"])))
+    if reader.bad_blocks or reader.truncated:
+        print("  skipped {} blocks with bad checksums{}".format(reader.bad_blocks, ", log ends part way through a block" if reader.truncated else ""))
+    print("Win rate by mode: " + "  ".join("{}:{:.1%}".format(mode, won / played) for mode, (played, won) in sorted(totals["modes"].items())))
+    print("Strikes by word length:")
+    for length, (played, won, strikes) in sorted(totals["lengths"].items()):
+        print("  {:>2}: {:.2f} strikes, {:.1%} won ({:,} rounds)".format(length, strikes / played, won / played, played))
+    print("Hardest words (at least {} rounds):".format(min_rounds))
+    for line, played, won, strikes in hardest_words(totals, min_rounds, top):
+        print("  {:<16} {:.1%} won, {:.2f} strikes ({:,} rounds)".format(name(line), won / played, strikes / played, played))
+    first = max(totals["first_guesses"], 1)
+    print("Most common wrong first guesses: " + "  ".join("{}:{:.1%}".format(chr(letter), count / first)
+        for letter, count in totals["first_misses"].most_common(top)))
+
+def write_json(totals, path, bank=None):
+    """Writes the aggregates - the per word stats are the ones to tune word difficulty from"""
+    with open(path, "w") as f:
+        json.dump({"games": totals["games"], "rounds": totals["rounds"], "rounds_won": totals["rounds_won"], "guesses": totals["guesses"],
+            "modes": {mode: {"rounds": played, "won": won} for mode, (played, won) in totals["modes"].items()},
+            "lengths": {length: {"rounds": played, "won": won, "strikes": strikes} for length, (played, won, strikes) in sorted(totals["lengths"].items())},
+            "first_misses": {chr(letter): count for letter, count in totals["first_misses"].most_common()},
+            "first_guesses": totals["first_guesses"],
+            "words": [{"line": line, "word": bank.get_word(line) if bank is not None else None, "rounds": played, "won": won, "strikes": strikes}
+                for line, (played, won, strikes) in sorted(totals["words"].items())],
+        }, f, indent=1, ensure_ascii=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregates a hangman replay log")
+    parser.add_argument("log", help="replay log written by hangman.py, server.py or simulate.py --replay")
+    parser.add_argument("--locale", default=DEFAULT_LOCALE, help="language of the word bank the log was written against")
+    parser.add_argument("--min-rounds", type=int, default=20, help="rounds a word needs to be in the hardest words")
+    parser.add_argument("--top", type=int, default=20, help="hardest words and wrong first guesses to show")
+    parser.add_argument("--json", help="also write the aggregates (with every word's stats) to this file")
+    args = parser.parse_args()
+
+    try:
+        reader = ReplayReader(args.log)
+    except (OSError, ReplayLogError) as e:
+        parser.error(str(e))
+    bank = load_log_bank(reader.bank_size, args.locale)
+    totals = aggregate(reader)
+    print_report(totals, reader, bank, args.min_rounds, args.top)
+    if args.json:
+        write_json(totals, args.json, bank)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""No-repeat sampling for long-lived players.
+
+A PermutationSampler walks a seeded pseudo-random permutation of 0..size-1, so every draw is O(1)
+time and memory and nothing repeats until all size values have been drawn (then a new permutation
+starts).  The permutation is a small Feistel network over the next power of 4 at or above size,
+with values outside the range skipped (cycle walking - fewer than 4 steps on average).  The whole
+state is (seed, cycle, index), so a sampler can be saved and resumed from that cursor.
+"""
+
+import random
+
+ROUNDS = 4
+
+
+class PermutationSampler:
+    __slots__ = ("size", "seed", "cycle", "index", "_half_bits", "_half_mask", "_keys")
+
+    def __init__(self, size, seed, cycle=0, index=0):
+        if size < 1:
+            raise ValueError("Can't sample from an empty range")
+        self.size = size
+        self.seed = seed
+        self.index = index #number of values drawn in this cycle
+        bits = max((size - 1).bit_length(), 2)
+        self._half_bits = (bits + 1) // 2
+        self._half_mask = (1 << self._half_bits) - 1
+        self._start_cycle(cycle)
+
+    def _start_cycle(self, cycle):
+        self.cycle = cycle
+        rng = random.Random("{}:{}".format(self.seed, cycle))
+        self._keys = tuple(rng.getrandbits(32) for _ in range(ROUNDS))
+
+    def permute(self, value):
+        """Maps 0..size-1 to 0..size-1 - a bijection for the current cycle"""
+        half_bits = self._half_bits
+        half_mask = self._half_mask
+        while True:
+            left = value >> half_bits
+            right = value & half_mask
+            for key in self._keys:
+                #round function - multiply by the golden ratio constant, fold the high bits down (inlined, it is the hot loop)
+                mixed = ((right ^ key) * 0x9E3779B1) & 0xFFFFFFFF
+                left, right = right, left ^ ((mixed ^ (mixed >> 15)) & half_mask)
+            value = (left << half_bits) | right
+            if value < self.size:
+                return value
+
+    def next(self):
+        """Returns the next value.  No value repeats until every value in the range has been drawn"""
+        if self.index >= self.size:
+            self._start_cycle(self.cycle + 1)
+            self.index = 0
+        value = self.permute(self.index)
+        self.index += 1
+        return value
+
+    def remaining(self):
+        """Values left before the permutation is exhausted"""
+        return self.size - self.index
+
+    def cursor(self):
+        """The sampler's whole state - pass it to from_cursor to carry on where this left off"""
+        return (self.seed, self.cycle, self.index)
+
+    @classmethod
+    def from_cursor(cls, size, cursor):
+        seed, cycle, index = cursor
+        return cls(size, seed, cycle, index)
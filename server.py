@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+"""Multi-session hangman server - many games in one asyncio event loop over a simple line protocol.
+
+Every connection gets its own session (a GameState driven by a HangmanEngine) and all the sessions
+in a language share its WordBank.  Commands are one per line and every command gets exactly one line back:
+
+    NEW <mode> [locale]  starts a game - p, r, e, m, h or a, in English unless a locale is given (NEW r fr)
+    GUESS <letter>  guesses a letter (a line with just the letter works too)
+    STATE           shows the current game
+    RESUME <token>  picks up a game left by a connection that closed (needs --store)
+    QUIT            closes the connection
+
+Replies start with OK or ERR, followed by key=value pairs, e.g.
+
+    OK guess=correct letter=e round=1 rounds=3 won=0 strikes=0 max_strikes=5 word=_e__ wrong=- game_over=0
+
+Once a round ends the reply also has result=won/lost and answer=<word>.
+
+With --store, sessions idle for --idle-timeout seconds are packed with HangmanEngine.snapshot() into a
+dbm file and their game state is dropped, so memory goes with the active players rather than the
+connected ones - the next line from the player restores the game.  Games are also stored when the
+connection closes; NEW replies then include token=<token> to RESUME with.
+
+Other languages' banks (word_parse.py --locale) are opened the first time a game asks for them and
+dropped again, least recently used first, once they add up to more than --bank-budget MB.
+
+    python3 server.py --port 7777
+    python3 server.py --store sessions.db --idle-timeout 60
+    python3 server.py --replay games.log
+    python3 server.py --load-test 10000
+"""
+
+import argparse
+import asyncio
+import dbm
+import random
+import resource
+import secrets
+import time
+
+import metrics
+from engine import GameState, GameStateError, GuessStatus, HangmanEngine, InputStatus, check_game_limits, get_mode_name
+from replay import ReplayLog, ReplayLogError
+from word_bank import DEFAULT_LOCALE, BankRegistry, BinaryWordBankError, load_word_bank, parse_score_splits
+
+MAX_LINE = 1024 #connections sending longer lines than this are closed
+GUESS_NAMES = {GuessStatus.CORRECT: "correct", GuessStatus.INCORRECT: "incorrect", GuessStatus.DUPLICATE: "duplicate"}
+
+
+class HangmanProtocol(asyncio.Protocol):
+    """One connected player.  A plain Protocol (no StreamReader or task per connection) keeps an idle
+    session down to this object, its GameState and the transport - or without the GameState once evicted."""
+    __slots__ = ("server", "engine", "transport", "buffer", "started", "token", "last_active", "locale")
+
+    def __init__(self, server):
+        self.server = server
+        self.engine = server.new_engine()
+        self.transport = None
+        self.buffer = b""
+        self.started = False #True once NEW has been sent
+        self.token = None #key of the session's game in the server's store
+        self.last_active = time.monotonic()
+        self.locale = "" #language of the game - "" for the server's own bank
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server.sessions += 1
+
+    def connection_lost(self, exc):
+        self.server.sessions -= 1
+        self.server.park(self)
+        self.transport = None
+
+    def data_received(self, data):
+        self.last_active = time.monotonic()
+        if self.engine is None:
+            self.server.wake(self)
+        self.buffer += data
+        replies = []
+        close = False
+        while not close and b"\n" in self.buffer:
+            line, self.buffer = self.buffer.split(b"\n", 1)
+            reply = self.server.handle_line(self, line.decode("utf-8", "replace"))
+            if reply is None:
+                close = True
+            else:
+                replies.append(reply)
+        if not close and len(self.buffer) > MAX_LINE:
+            replies.append("ERR line too long")
+            close = True
+        if replies:
+            self.transport.write(("\n".join(replies) + "\n").encode("utf-8")) #one write for everything in this read
+        if close:
+            self.transport.close()
+
+
+class HangmanServer:
+    def __init__(self, bank, number_rounds=3, max_strikes=5, rng=random, store=None, idle_timeout=60.0, banks=None, replay=None):
+        check_game_limits(number_rounds, max_strikes) #every game has to fit a snapshot to be evicted
+        self.bank = bank
+        self.banks = banks #BankRegistry for games in other languages, None for only bank
+        self.replay = replay #ReplayLog the games over bank are recorded to, None to not record them
+        self.number_rounds = number_rounds
+        self.max_strikes = max_strikes
+        self.rng = rng
+        self.store = store #dbm (or any bytes mapping) of token:snapshot, None to keep every game in memory
+        self.idle_timeout = idle_timeout
+        self.sessions = 0 #number of connected sessions
+        self.active = set() #sessions with a game loaded - the ones that can be evicted
+        self.tokens = {} #token:connected session it belongs to, so two sessions never share a stored game
+        self.evictions = 0
+        self._sweep = None #call_later handle of the next evict_idle
+
+    def new_engine(self, locale=""):
+        """Returns an engine over the locale's bank - raises ValueError for a locale the server can't play"""
+        if not locale:
+            bank = self.bank
+        elif self.banks is None:
+            raise ValueError("only one language on this server")
+        else:
+            try:
+                bank = self.banks.get(locale)
+            except (OSError, BinaryWordBankError) as e:
+                raise ValueError(f"no word bank for {locale}") from e
+        recorder = self.replay.recorder() if self.replay is not None and bank is self.bank else None #the log's lines are bank's
+        return HangmanEngine(bank, GameState(self.number_rounds, self.max_strikes), self.rng, recorder)
+
+    def pack_session(self, session):
+        """The stored form of a session's game - its locale, a new line, then the engine snapshot"""
+        return session.locale.encode("ascii") + b"\n" + session.engine.snapshot()
+
+    def unpack_session(self, data):
+        """Returns (locale, engine) from pack_session() bytes - raises GameStateError if the game can't be restored"""
+        locale, _, snapshot = data.partition(b"\n")
+        try:
+            locale = locale.decode("ascii")
+            engine = self.new_engine(locale)
+        except ValueError as e: #includes UnicodeDecodeError
+            raise GameStateError(f"Can't restore the game: {e}")
+        engine.restore(snapshot)
+        return locale, engine
+
+    @metrics.timed("session_evict")
+    def evict(self, session):
+        """Stores the session's game and drops its engine"""
+        self.store[session.token] = self.pack_session(session)
+        session.engine.abandon()
+        session.engine = None
+        self.active.discard(session)
+        self.evictions += 1
+
+    def evict_idle(self, timeout=None):
+        """Evicts every session that hasn't sent anything for timeout seconds (idle_timeout by default)"""
+        cutoff = time.monotonic() - (self.idle_timeout if timeout is None else timeout)
+        for session in [session for session in self.active if session.last_active <= cutoff]:
+            self.evict(session)
+
+    @metrics.timed("session_wake")
+    def wake(self, session):
+        """Restores an evicted session's game from the store.  If it is gone or can't be restored the
+        session starts over without a game (or token).  The stored copy is left for the next evict to
+        overwrite - deleting from dbm.dumb rewrites its whole index."""
+        try:
+            session.locale, session.engine = self.unpack_session(self.store[session.token])
+        except (KeyError, GameStateError):
+            del self.tokens[session.token]
+            session.token = None
+            session.locale = ""
+            session.engine = self.new_engine()
+            session.started = False
+            return
+        self.active.add(session)
+
+    def park(self, session):
+        """Stores the game of a closed connection so it can be RESUMEd"""
+        self.active.discard(session)
+        self.tokens.pop(session.token, None)
+        if self.store is not None and session.engine is not None and session.started:
+            if not session.engine.game_over:
+                self.store[session.token] = self.pack_session(session)
+            elif session.token in self.store:
+                del self.store[session.token] #a finished game left from an earlier evict
+        if session.engine is not None:
+            session.engine.abandon()
+        session.engine = None
+
+    def resume(self, session, token):
+        """Moves a stored game to this session.  Returns False if there is no game with that token, or
+        it belongs to a session that is still connected"""
+        if self.tokens.get(token, session) is not session:
+            return False
+        try:
+            data = self.store[token]
+        except KeyError:
+            return False
+        try:
+            locale, engine = self.unpack_session(data)
+        except GameStateError:
+            return False
+        del self.store[token]
+        session.engine.abandon() #the game this session had is replaced
+        if session.token is not None:
+            del self.tokens[session.token]
+        self.tokens[token] = session
+        session.locale = locale
+        session.engine = engine
+        session.token = token
+        session.started = True
+        self.active.add(session)
+        return True
+
+    @metrics.timed("server_command")
+    def handle_line(self, session, line):
+        """Processes one command and returns the reply line (without the new line).  Returns None for QUIT"""
+        command, _, argument = line.strip().partition(" ")
+        command = command.upper()
+        engine = session.engine
+        if command == "QUIT":
+            return None
+        if command == "NEW":
+            mode, _, locale = argument.strip().partition(" ")
+            mode = mode.lower()
+            locale = locale.strip()
+            if get_mode_name(mode) == "unknown":
+                return "ERR unknown mode - expected p, r, e, m, h or a"
+            if locale == DEFAULT_LOCALE:
+                locale = "" #the server's own bank
+            if locale != session.locale:
+                try:
+                    new_engine = self.new_engine(locale)
+                except ValueError as e:
+                    return "ERR " + str(e)
+                engine.abandon()
+                engine = session.engine = new_engine
+                session.locale = locale
+            engine.new_game(mode)
+            session.started = True
+            if self.store is None:
+                return "OK " + format_state(engine.config)
+            if session.token is None:
+                session.token = secrets.token_hex(8)
+                self.tokens[session.token] = session
+            self.active.add(session)
+            return "OK " + format_state(engine.config) + " token=" + session.token
+        if command == "RESUME":
+            if self.store is None:
+                return "ERR sessions aren't stored on this server"
+            if not self.resume(session, argument.strip()):
+                return "ERR no game with that token"
+            return "OK " + format_state(session.engine.config)
+        if command == "STATE":
+            if not session.started:
+                return "ERR no game - send NEW <mode>"
+            return "OK " + format_state(engine.config)
+        if command != "GUESS":
+            if len(command) != 1: #a bare letter is a guess
+                return "ERR unknown command"
+            argument = command.lower()
+        if not session.started:
+            return "ERR no game - send NEW <mode>"
+        try:
+            result = engine.guess(argument.strip())
+        except GameStateError:
+            return "ERR game over - send NEW <mode>"
+        if result.input_status != InputStatus.VALID:
+            if result.input_status == InputStatus.EXIT:
+                return None
+            return "ERR " + result.value
+        reply = "OK guess={} letter={} ".format(GUESS_NAMES[result.guess_status], result.value) + format_state(engine.config)
+        if result.round_over:
+            reply += " result={} answer={}".format("won" if result.round_won else "lost", result.word)
+        return reply
+
+    async def start(self, host="127.0.0.1", port=7777):
+        loop = asyncio.get_running_loop()
+        if self.store is not None and self.idle_timeout:
+            self.schedule_sweep(loop)
+        return await loop.create_server(lambda: HangmanProtocol(self), host, port)
+
+    def schedule_sweep(self, loop):
+        """Runs evict_idle every half idle_timeout"""
+        def sweep():
+            try:
+                self.evict_idle()
+            finally: #one session failing to evict mustn't stop the sweeps
+                self._sweep = loop.call_later(self.idle_timeout / 2, sweep)
+        self._sweep = loop.call_later(self.idle_timeout / 2, sweep)
+
+    def stop(self):
+        if self._sweep is not None:
+            self._sweep.cancel()
+            self._sweep = None
+
+
+def format_state(config):
+    return "round={} rounds={} won={} strikes={} max_strikes={} word={} wrong={} game_over={}".format(
+        min(config["current_round"], config["number_rounds"]), config["number_rounds"], config["rounds_won"],
+        config["current_strikes"], config["max_strikes"], config["display_letters"] or "-", config["wrong_letters"] or "-",
+        int(config["exit_requested"] or config["current_round"] > config["number_rounds"]))
+
+def get_rss_kb():
+    """Current resident set size in kB (Linux), falls back to the peak RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+async def run_client(host, port, commands):
+    """Sends the commands to a server and returns the reply lines - handy for trying the server out"""
+    reader, writer = await asyncio.open_connection(host, port)
+    replies = []
+    for command in commands:
+        writer.write(command.encode("utf-8") + b"\n")
+        await writer.drain()
+        replies.append((await reader.readline()).decode("utf-8").rstrip("\n"))
+    writer.close()
+    await writer.wait_closed()
+    return replies
+
+class LoadTestClient(asyncio.Protocol):
+    """Bare bones client for the load test, so the client side doesn't swamp the memory numbers"""
+    __slots__ = ("transport", "reply")
+
+    def __init__(self):
+        self.transport = None
+        self.reply = None #future for the next reply line
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        if self.reply is not None and not self.reply.done():
+            self.reply.set_result(data)
+
+    def send(self, line):
+        self.reply = asyncio.get_running_loop().create_future()
+        self.transport.write(line)
+        return self.reply
+
+async def load_test(server, sessions, guesses, host="127.0.0.1", port=0):
+    """Opens a lot of idle sessions against an in process server, then times guesses on some of them"""
+    loop = asyncio.get_running_loop()
+    tcp_server = await server.start(host, port)
+    port = tcp_server.sockets[0].getsockname()[1]
+    rss_before = get_rss_kb()
+    clients = []
+    for i in range(sessions):
+        transport, client = await loop.create_connection(LoadTestClient, host, port)
+        clients.append(client)
+    await asyncio.gather(*(client.send(b"NEW r\n") for client in clients))
+    rss_after = get_rss_kb()
+    print("{} sessions open - {:.1f} MB for the server and client sides ({:.2f} kB per session)".format(
+        server.sessions, (rss_after - rss_before) / 1024, (rss_after - rss_before) / max(sessions, 1)))
+    if server.store is not None:
+        start = time.perf_counter()
+        server.evict_idle(0)
+        print("Evicted {} sessions in {:.2f}s - {} still in memory".format(server.evictions, time.perf_counter() - start, len(server.active)))
+
+    latencies = []
+    letters = "etaoinshrdlcumwfgypbvkjxqz"
+    for i in range(guesses):
+        client = clients[i % len(clients)]
+        start = time.perf_counter()
+        await client.send("GUESS {}\n".format(letters[(i // len(clients)) % 26]).encode("ascii"))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    if latencies:
+        print("{} guesses - median {:.3f} ms, p99 {:.3f} ms round trip".format(len(latencies),
+            latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000))
+    for client in clients:
+        client.transport.close()
+    server.stop()
+    tcp_server.close()
+    await tcp_server.wait_closed()
+
+def main():
+    parser = argparse.ArgumentParser(description="Hangman line protocol server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-strikes", type=int, default=5)
+    parser.add_argument("--store", help="dbm file to evict idle sessions to (and keep closed connections' games in)")
+    parser.add_argument("--idle-timeout", type=float, default=60.0, help="seconds before an idle session is evicted to the store")
+    parser.add_argument("--score-splits", type=parse_score_splits,
+        help="fractions of the score sorted words where medium and hard start (default 0.333,0.667)")
+    parser.add_argument("--bank-budget", type=float, default=64.0, help="MB of other languages' word banks to keep open")
+    parser.add_argument("--replay", help="append the English games to this replay log (see replay.py)")
+    parser.add_argument("--load-test", type=int, metavar="SESSIONS", help="open this many sessions against an in process server and report memory and latency")
+    parser.add_argument("--guesses", type=int, default=10000, help="guesses to time in the load test")
+    args = parser.parse_args()
+    try:
+        check_game_limits(args.rounds, args.max_strikes)
+    except ValueError as e:
+        parser.error(str(e))
+
+    bank = load_word_bank("hangman_word_bank", "hangman_word_bank.bin", scores_path="hangman_word_bank_scores",
+        score_splits=args.score_splits, weights_path="hangman_word_bank_weights")
+    try:
+        replay = ReplayLog(args.replay, len(bank)) if args.replay else None
+    except (OSError, ReplayLogError) as e:
+        parser.error(str(e))
+    store = dbm.open(args.store, "c") if args.store else None
+    server = HangmanServer(bank, args.rounds, args.max_strikes, store=store, idle_timeout=args.idle_timeout,
+        banks=BankRegistry(int(args.bank_budget * (1 << 20)), score_splits=args.score_splits), replay=replay)
+    try:
+        if args.load_test:
+            asyncio.run(load_test(server, args.load_test, args.guesses))
+            return
+
+        async def serve():
+            tcp_server = await server.start(args.host, args.port)
+            print("Serving hangman on {}:{}".format(args.host, args.port))
+            async with tcp_server:
+                await tcp_server.serve_forever()
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+    finally:
+        if store is not None:
+            store.close()
+        if replay is not None:
+            replay.close()
+        metrics.dump()
+
+if __name__ == "__main__":
+    main()
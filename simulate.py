@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""Plays lots of solver vs engine games across a process pool and reports aggregated statistics.
+
+Every worker memory maps the same binary word bank, so the words are shared through the page
+cache instead of being parsed per process.  Workers play games in batches and send back one
+small aggregate per batch (never per game objects), which the parent merges as they arrive.
+
+    python3 simulate.py -n 100000 -m p r e m h --max-strikes 5 --score-splits 0.4,0.8
+    python3 simulate.py -n 100000 --scores none --thresholds 3,7,13
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from engine import HangmanEngine, new_game_config, get_mode_name
+from replay import ReplayLog
+from solver import HangmanSolver, SolverIndex, STRATEGIES
+from word_bank import load_word_bank, parse_score_splits, DEFAULT_THRESHOLDS
+
+_worker = {} #per process solver and settings, set up by init_worker
+
+
+def init_worker(bank_path, bin_path, thresholds, strategy, scores_path, score_splits=None, replay_path=None):
+    bank = load_word_bank(bank_path, bin_path, thresholds, scores_path, score_splits)
+    _worker["bank"] = bank
+    _worker["solver"] = HangmanSolver(SolverIndex(bank), strategy)
+    _worker["replay"] = ReplayLog(replay_path, len(bank)) if replay_path else None
+
+def new_aggregate(max_strikes):
+    return {"games": 0,
+        "games_won": 0,
+        "rounds": 0,
+        "rounds_won": 0,
+        "guesses": 0,
+        "strikes": [0] * (max_strikes + 2), #strikes at the end of each round: 0 to max_strikes + 1 (lost)
+        "lengths": {}, #word length:[rounds played, rounds solved]
+    }
+
+def merge_aggregate(total, batch):
+    for key in ("games", "games_won", "rounds", "rounds_won", "guesses"):
+        total[key] += batch[key]
+    for strikes, count in enumerate(batch["strikes"]):
+        total["strikes"][strikes] += count
+    for length, (played, solved) in batch["lengths"].items():
+        entry = total["lengths"].setdefault(length, [0, 0])
+        entry[0] += played
+        entry[1] += solved
+
+def play_batch(mode, games, seed, number_rounds, max_strikes):
+    """Worker task - plays a batch of games and returns the batch aggregate"""
+    solver = _worker["solver"]
+    replay = _worker["replay"]
+    engine = HangmanEngine(_worker["bank"], new_game_config(number_rounds, max_strikes), random.Random(seed),
+        None if replay is None else replay.recorder())
+    aggregate = new_aggregate(max_strikes)
+    strikes = aggregate["strikes"]
+    lengths = aggregate["lengths"]
+    config = engine.config
+    for _ in range(games):
+        engine.new_game(mode)
+        while not engine.game_over:
+            result, guesses = solver.play_round(engine)
+            aggregate["guesses"] += guesses
+            strikes[result.strikes] += 1
+            entry = lengths.setdefault(len(result.word), [0, 0])
+            entry[0] += 1
+            entry[1] += result.round_won
+            aggregate["rounds_won"] += result.round_won
+        aggregate["rounds"] += number_rounds
+        aggregate["games_won"] += config["rounds_won"] * 2 > number_rounds
+    aggregate["games"] = games
+    if replay is not None:
+        replay.sync() #worker processes exit without any clean up, so the batch is written before returning
+    return aggregate
+
+def simulate_mode(executor, workers, mode, games, batch_size, seed, number_rounds, max_strikes):
+    """Submits the batches for a mode, keeping a few per worker in flight, and merges them as they finish"""
+    total = new_aggregate(max_strikes)
+    pending = set()
+    submitted = 0
+    batch = 0
+    while submitted < games or pending:
+        while submitted < games and len(pending) < workers * 4:
+            size = min(batch_size, games - submitted)
+            #every batch gets its own seed so the results don't depend on which worker ran it
+            pending.add(executor.submit(play_batch, mode, size, f"{seed}:{mode}:{batch}", number_rounds, max_strikes))
+            submitted += size
+            batch += 1
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            merge_aggregate(total, future.result())
+    return total
+
+def print_report(mode, total, elapsed):
+    rounds = max(total["rounds"], 1)
+    print("{} mode: {} games in {:.2f}s - {:.0f} games/s, {:.0f} guesses/s".format(get_mode_name(mode), total["games"],
+        elapsed, total["games"] / elapsed, total["guesses"] / elapsed))
+    print("  game win rate:  {:.2%}".format(total["games_won"] / max(total["games"], 1)))
+    print("  round win rate: {:.2%}".format(total["rounds_won"] / rounds))
+    print("  strikes: " + "  ".join("{}:{:.1%}".format(i, count / rounds) for i, count in enumerate(total["strikes"])))
+    print("  solve rate by length: " + "  ".join("{}:{:.1%}".format(length, solved / played)
+        for length, (played, solved) in sorted(total["lengths"].items())))
+
+def parse_thresholds(value):
+    easy, medium, hard = (int(x) for x in value.split(","))
+    return {"easy": easy, "medium": medium, "hard": hard}
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulates solver vs engine hangman games")
+    parser.add_argument("-n", "--games", type=int, default=10000, help="games to play per mode")
+    parser.add_argument("-m", "--modes", nargs="+", default=list("premh"), choices=list("premha"))
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-b", "--batch-size", type=int, default=500, help="games per worker task")
+    parser.add_argument("-s", "--strategy", default="frequency", choices=STRATEGIES)
+    parser.add_argument("--max-strikes", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3, help="rounds per game")
+    parser.add_argument("--thresholds", type=parse_thresholds,
+        help="minimum easy,medium,hard word lengths (default 3,7,13) - only without a scores file")
+    parser.add_argument("--score-splits", type=parse_score_splits,
+        help="fractions of the score sorted words where medium and hard start (default 0.333,0.667)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bank", default="hangman_word_bank")
+    parser.add_argument("--bin", default="hangman_word_bank.bin")
+    parser.add_argument("--scores", default="hangman_word_bank_scores", help="difficulty scores file (--scores none to go by length)")
+    parser.add_argument("--json", help="also write the aggregates to this file")
+    parser.add_argument("--replay", help="append every game to this replay log (see replay.py)")
+    args = parser.parse_args()
+
+    results = {}
+    scores_path = None if args.scores == "none" else args.scores
+    bank = load_word_bank(args.bank, args.bin, args.thresholds, scores_path, args.score_splits)
+    if bank.difficulty_by == "score" and args.thresholds is not None:
+        parser.error("--thresholds don't apply when difficulty goes by the scores file - use --score-splits, or --scores none")
+    if bank.difficulty_by == "length" and args.score_splits is not None:
+        parser.error("--score-splits need a difficulty scores file (--scores)")
+    thresholds = args.thresholds or DEFAULT_THRESHOLDS
+    if args.replay:
+        ReplayLog(args.replay, len(bank)).close() #the log header is written here so the workers only ever append
+    init_args = (args.bank, args.bin, thresholds, args.strategy, scores_path, args.score_splits, args.replay)
+    with ProcessPoolExecutor(args.workers, initializer=init_worker, initargs=init_args) as executor:
+        for mode in args.modes:
+            start = time.perf_counter()
+            total = simulate_mode(executor, args.workers, mode, args.games, args.batch_size, args.seed, args.rounds, args.max_strikes)
+            elapsed = time.perf_counter() - start
+            print_report(mode, total, elapsed)
+            total["seconds"] = elapsed
+            results[mode] = total
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": {"max_strikes": args.max_strikes, "thresholds": thresholds, "rounds": args.rounds,
+                "strategy": args.strategy, "seed": args.seed, "scores": scores_path, "score_splits": args.score_splits}, "modes": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Hangman solver that plays against the game engine.
+
+The word bank is indexed once into bitsets - one Python int per (word length, position, letter)
+and per (word length, letter), with bit i standing for the i'th word of that length.  Narrowing the
+candidates after a guess is then a handful of big int AND operations (done in C over 64 bit
+words), and scoring a letter is an AND and a bit_count(), instead of a Python loop over the words.
+Letters are indexed by their place in the bank's alphabet, so banks in other languages work the same way.
+"""
+
+import math
+import random
+import sys
+
+from word_bank import DEFAULT_ALPHABET, load_word_bank
+
+LETTERS = DEFAULT_ALPHABET
+FALLBACK_ORDER = "etaoinsrhldcumfpgwybvkxjqz" #used when no candidate word matches (word not in the bank)
+STRATEGIES = ("frequency", "entropy")
+
+
+def _letter_table(code):
+    """bytes.translate table mapping the byte code to 1 and every other byte to 0 (as ASCII digits)"""
+    return bytes(49 if b == code else 48 for b in range(256))
+
+
+class SolverIndex:
+    """Bitset index over every length bucket of a WordBank"""
+
+    def __init__(self, bank):
+        self.bank = bank
+        self.alphabet = bank.alphabet
+        self.letter_index = {letter: i for i, letter in enumerate(self.alphabet)}
+        self.first_lines = {} #length:first line of the bucket
+        self.counts = {} #length:number of words
+        self.positions = {} #length:[position][letter index] bitset
+        self.contains = {} #length:[letter index] bitset
+        words = bank.words
+        if words.char_width == 1:
+            codes = self.alphabet.encode(words.encoding) #one byte per letter already
+            translation = None
+        else:
+            if len(self.alphabet) > 256:
+                raise ValueError("Can't index an alphabet of more than 256 letters")
+            codes = bytes(range(len(self.alphabet)))
+            translation = {ord(letter): i for i, letter in enumerate(self.alphabet)} #letter:its byte code
+        tables = [_letter_table(code) for code in codes]
+        for length, first_line, count, data in words.buckets():
+            if translation is None:
+                data = bytes(data)
+            else:
+                data = bytes(data).decode(words.encoding).translate(translation).encode("latin-1")
+            self._index_bucket(length, first_line, count, data, tables)
+        if self.alphabet == LETTERS:
+            self.fallback_order = FALLBACK_ORDER
+        else: #the letters in the most words first
+            totals = [0] * len(self.alphabet)
+            for contains in self.contains.values():
+                for i, bitset in enumerate(contains):
+                    totals[i] += bitset.bit_count()
+            self.fallback_order = "".join(sorted(self.alphabet, key=lambda letter: -totals[self.letter_index[letter]]))
+        self._nbytes = sum(sys.getsizeof(bitset) for positions in self.positions.values() for bits in positions for bitset in bits)
+        self._nbytes += sum(sys.getsizeof(bitset) for contains in self.contains.values() for bitset in contains)
+
+    def nbytes(self):
+        """Bytes of the bitsets - the index doesn't change once built"""
+        return self._nbytes
+
+    def _index_bucket(self, length, first_line, count, data, tables):
+        self.first_lines[length] = first_line
+        self.counts[length] = count
+        positions = []
+        contains = [0] * len(tables)
+        for position in range(length):
+            column = data[position::length] #byte i is the letter at this position of word i
+            bits = []
+            for i, table in enumerate(tables):
+                #reversed so word 0 is the lowest bit
+                bitset = int(column.translate(table)[::-1] or b"0", 2)
+                bits.append(bitset)
+                contains[i] |= bitset
+            positions.append(bits)
+        self.positions[length] = positions
+        self.contains[length] = contains
+
+    def all_words(self, length):
+        """Returns the bitset of every word with the given length (0 if there are none)"""
+        return (1 << self.counts.get(length, 0)) - 1
+
+    def get_word(self, length, i):
+        return self.bank.get_word(self.first_lines[length] + i)
+
+    def words(self, length, candidates):
+        """Yields the words in the candidate bitset"""
+        i = 0
+        while candidates:
+            if candidates & 1:
+                yield self.get_word(length, i)
+            candidates >>= 1
+            i += 1
+
+    def apply_guess(self, length, candidates, letter, revealed):
+        """Narrows the candidates after guessing letter.  revealed is the list of positions the letter
+        was found at (empty for a wrong guess)."""
+        i = self.letter_index.get(letter, -1)
+        if i == -1:
+            return candidates
+        if not revealed:
+            return candidates & ~self.contains[length][i]
+        positions = self.positions[length]
+        for position in range(length):
+            if position in revealed:
+                candidates &= positions[position][i]
+            else:
+                candidates &= ~positions[position][i]
+        return candidates
+
+    def filter(self, pattern, wrong_letters):
+        """Returns the bitset of words matching the pattern ("_" for unrevealed letters) and containing none of the wrong letters"""
+        length = len(pattern)
+        candidates = self.all_words(length)
+        for letter in set(pattern) - {"_"}:
+            candidates = self.apply_guess(length, candidates, letter, [p for p, c in enumerate(pattern) if c == letter])
+        for letter in wrong_letters:
+            candidates = self.apply_guess(length, candidates, letter, [])
+        return candidates
+
+    def partition(self, length, candidates, letter):
+        """Splits the candidates by where the letter appears.  Returns a dictionary of position
+        mask (bit p set when the letter is at position p, 0 when it is not in the word):bitset"""
+        i = self.letter_index.get(letter, -1)
+        if i == -1:
+            return {0: candidates}
+        present = candidates & self.contains[length][i]
+        families = {}
+        if candidates & ~present:
+            families[0] = candidates & ~present
+        if present:
+            split = {0: present}
+            positions = self.positions[length]
+            for position in range(length):
+                at = positions[position][i]
+                next_split = {}
+                for mask, words in split.items():
+                    if words & at:
+                        next_split[mask | (1 << position)] = words & at
+                    if words & ~at:
+                        next_split[mask] = words & ~at
+                split = next_split
+            families.update(split)
+        return families
+
+
+def get_solver_index(bank):
+    """Returns the SolverIndex for a WordBank, indexing it the first time it is asked for"""
+    index = bank.indexes.get("solver")
+    if index is None:
+        index = bank.indexes["solver"] = SolverIndex(bank)
+    return index
+
+def random_member(candidates, rng=random):
+    """Returns the number of a random word in a non empty candidate bitset, each with the same chance.
+    Picks k below the number of words and narrows down to the k-th set bit by halving the bit range."""
+    k = rng.randrange(candidates.bit_count())
+    low, high = 0, candidates.bit_length() #the k-th set bit from low is below high
+    while high - low > 64:
+        middle = (low + high) // 2
+        count = ((candidates >> low) & ((1 << (middle - low)) - 1)).bit_count()
+        if k < count:
+            high = middle
+        else:
+            k -= count
+            low = middle
+    bits = candidates >> low
+    for _ in range(k): #at most 64 set bits to clear
+        bits &= bits - 1
+    return low + (bits & -bits).bit_length() - 1
+
+
+class HangmanSolver:
+    """Picks letters by how many candidate words contain them (frequency) or by the expected
+    information from where they would be revealed (entropy)"""
+
+    def __init__(self, index, strategy="frequency"):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy} - expected one of {STRATEGIES}")
+        self.index = index
+        self.strategy = strategy
+
+    def next_guess(self, length, candidates, guessed):
+        """Returns the best letter that hasn't been guessed yet"""
+        total = candidates.bit_count()
+        if total == 0:
+            for letter in self.index.fallback_order:
+                if letter not in guessed:
+                    return letter
+            raise ValueError("Every letter has already been guessed")
+        best = None
+        best_score = -1.0
+        contains = self.index.contains[length]
+        for i, letter in enumerate(self.index.alphabet):
+            if letter in guessed:
+                continue
+            if self.strategy == "frequency":
+                score = (candidates & contains[i]).bit_count()
+            else:
+                score = 0.0
+                for words in self.index.partition(length, candidates, letter).values():
+                    p = words.bit_count() / total
+                    score -= p * math.log2(p)
+                score += (candidates & contains[i]).bit_count() / total / 1000 #prefer likely hits when the information is equal
+            if score > best_score:
+                best = letter
+                best_score = score
+        return best
+
+    def solve_word(self, word, max_strikes=5):
+        """Plays a round against the given word without an engine.  Returns (won, strikes, number of guesses)"""
+        length = len(word)
+        candidates = self.index.all_words(length)
+        guessed = set()
+        remaining = set(word)
+        strikes = 0
+        while strikes <= max_strikes:
+            letter = self.next_guess(length, candidates, guessed)
+            guessed.add(letter)
+            revealed = [p for p, c in enumerate(word) if c == letter]
+            if revealed:
+                remaining.discard(letter)
+                if not remaining:
+                    return True, strikes, len(guessed)
+            else:
+                strikes += 1
+            candidates = self.index.apply_guess(length, candidates, letter, revealed)
+        return False, strikes, len(guessed)
+
+    def play_round(self, engine):
+        """Guesses until the engine's current round is over.  Returns (GuessResult of the last guess, number of guesses)"""
+        config = engine.config
+        length = config["digits_in_word"]
+        candidates = self.index.filter(config["display_letters"], config["wrong_letters"])
+        guessed = set(config["correct_letters"]) | set(config["wrong_letters"])
+        guesses = 0
+        while True:
+            letter = self.next_guess(length, candidates, guessed)
+            guessed.add(letter)
+            guesses += 1
+            result = engine.guess(letter)
+            if result.round_over:
+                return result, guesses
+            revealed = [p for p, c in enumerate(config["display_letters"]) if c == letter]
+            candidates = self.index.apply_guess(length, candidates, letter, revealed)
+
+    def play_game(self, engine, mode):
+        """Plays a whole game in the given mode.  Returns the list of round GuessResults"""
+        engine.new_game(mode)
+        results = []
+        while not engine.game_over:
+            results.append(self.play_round(engine)[0])
+        return results
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Plays hangman rounds with the solver and reports the results")
+    parser.add_argument("-n", "--rounds", type=int, default=1000, help="number of rounds to play")
+    parser.add_argument("-d", "--difficulty", default="random", help="easy, medium, hard or random")
+    parser.add_argument("-s", "--strategy", default="frequency", choices=STRATEGIES)
+    parser.add_argument("--max-strikes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    bank = load_word_bank("hangman_word_bank", "hangman_word_bank.bin")
+    start = time.perf_counter()
+    solver = HangmanSolver(SolverIndex(bank), args.strategy)
+    print("Indexed {} words in {:.2f}s".format(len(bank), time.perf_counter() - start))
+
+    rng = random.Random(args.seed)
+    wins = 0
+    strikes = 0
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        won, round_strikes, guesses = solver.solve_word(bank.sample(args.difficulty, rng), args.max_strikes)
+        wins += won
+        strikes += round_strikes
+    elapsed = time.perf_counter() - start
+    print("Won {} of {} rounds ({:.1%}), {:.2f} strikes per round".format(wins, args.rounds, wins / args.rounds, strikes / args.rounds))
+    print("{:.0f} rounds per second".format(args.rounds / elapsed))
+
+if __name__ == "__main__":
+    main()
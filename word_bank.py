@@ -0,0 +1,596 @@
+"""Binary word bank format shared by word_parse.py (writer) and hangman.py (reader).
+
+Layout (all integers little endian):
+    header        - magic, version, number of lengths, number of words, data offset, bytes per letter,
+                    alphabet size in bytes
+    length table  - one entry per word length: length, first line, byte offset into the data
+    alphabet      - the letters the words are made of, UTF-8
+    data          - the words packed back to back with no separators
+
+Words are grouped by length, so every word in a length bucket has the same width and
+word N can be found with a bit of arithmetic instead of scanning the file.  Every letter takes the
+same number of bytes for that reason - 1 (latin-1) when the alphabet fits, otherwise 4 (UTF-32).
+Line numbers match the hangman_word_bank text file (first word is line 1).  Version 1 files (no
+letter width or alphabet - always a to z, 1 byte per letter) can still be read.
+
+Each locale has its own set of files (locale_paths) - English keeps the original names.
+"""
+
+import mmap
+import random
+import re
+import struct
+import weakref
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+
+import metrics
+
+MAGIC = b"HMWB"
+VERSION = 2
+#magic, version, number of lengths, number of words, data offset, bytes per letter, alphabet size in bytes
+HEADER = struct.Struct("<4sHHIIBxH")
+HEADER_V1 = struct.Struct("<4sHHII") #magic, version, number of lengths, number of words, data offset
+ENCODINGS = {1: "latin-1", 4: "utf-32-le"} #bytes per letter:encoding - fixed width either way
+LENGTH_ENTRY = struct.Struct("<HII") #word length, first line, byte offset into the data
+
+SCORES_MAGIC = b"HMWS"
+SCORES_VERSION = 1
+SCORES_HEADER = struct.Struct("<4sHxxI") #magic, version, number of words (padded so the arrays are aligned)
+
+WEIGHTS_MAGIC = b"HMWF"
+WEIGHTS_VERSION = 1
+WEIGHTS_HEADER = struct.Struct("<4sHxxI") #magic, version, number of words
+
+DIFFICULTIES = ("easy", "medium", "hard")
+DEFAULT_THRESHOLDS = {"easy": 3, "medium": 7, "hard": 13} #difficulty:minimum word length
+DEFAULT_SCORE_SPLITS = (1 / 3, 2 / 3) #fraction of the score sorted words where medium and hard start
+DEFAULT_ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+DEFAULT_LOCALE = "en"
+LOCALE_PATTERN = re.compile(r"[a-z]{2,3}(_[A-Za-z0-9]{2,8})?$") #en, pt_BR... - locales end up in file names
+DEFAULT_BANK_BUDGET = 64 << 20 #bytes of word banks a BankRegistry keeps open
+
+_loaded_banks = {} #(paths, thresholds):WordBank - so a process only loads each bank once
+
+
+class BinaryWordBankError(Exception):
+    """Raised when the binary word bank file is missing or not in the expected format"""
+    pass
+
+
+class WordBankFormatError(Exception):
+    """Raised when the words can't be used to build a word bank (e.g. not sorted by length)"""
+    pass
+
+
+def letter_width(alphabet):
+    """Bytes per letter for a bank over the alphabet - 1 when every letter fits in latin-1, otherwise 4"""
+    return 1 if all(ord(letter) < 256 for letter in alphabet) else 4
+
+def locale_paths(locale=DEFAULT_LOCALE):
+    """Returns the word bank file names for a locale - bank, idx, bin, scores and weights"""
+    if not LOCALE_PATTERN.match(locale):
+        raise ValueError(f"{locale!r} is not a locale name")
+    base = "hangman_word_bank" if locale == DEFAULT_LOCALE else "hangman_word_bank_" + locale
+    return {"bank": base, "idx": base + "_idx", "bin": base + ".bin", "scores": base + "_scores", "weights": base + "_weights"}
+
+def pack_words(words, alphabet=None):
+    """Packs words (sorted by length, may include trailing new lines) into a length table and one
+    bytes buffer.  alphabet defaults to the letters in the words.  Returns (lengths, data, number of words,
+    bytes per letter, alphabet); lengths is a list of [length, first line, byte offset]"""
+    words = [word.strip() for word in words]
+    if alphabet is None:
+        alphabet = "".join(sorted(set("".join(words))))
+    width = letter_width(alphabet)
+    encoding = ENCODINGS[width]
+    lengths = []
+    data = bytearray()
+    line = 0
+    for word in words:
+        line += 1
+        if not lengths or lengths[-1][0] != len(word):
+            if lengths and lengths[-1][0] > len(word):
+                raise WordBankFormatError(f"words must be sorted by length - line {line} is out of order")
+            lengths.append([len(word), line, len(data)])
+        data += word.encode(encoding)
+    return lengths, data, line, width, alphabet
+
+def pack_header(lengths, num_words, width, alphabet):
+    """Returns the header, length table and alphabet of a binary bank - everything before the data"""
+    alphabet = alphabet.encode("utf-8")
+    data_offset = HEADER.size + LENGTH_ENTRY.size * len(lengths) + len(alphabet)
+    return b"".join([HEADER.pack(MAGIC, VERSION, len(lengths), num_words, data_offset, width, len(alphabet))]
+        + [LENGTH_ENTRY.pack(*entry) for entry in lengths] + [alphabet])
+
+def write_binary_bank(words, path, alphabet=None):
+    """Writes a list of words (sorted by length, may include trailing new lines) to the binary bank file"""
+    lengths, data, num_words, width, alphabet = pack_words(words, alphabet)
+    with open(path, "wb") as f:
+        f.write(pack_header(lengths, num_words, width, alphabet))
+        f.write(data)
+
+def write_binary_bank_buckets(buckets, path, alphabet=DEFAULT_ALPHABET):
+    """Streaming version of write_binary_bank.  buckets is a list of (length, number of words, iterable of words)
+    sorted by length - the counts (and the alphabet) are needed up front to write the header before the words"""
+    width = letter_width(alphabet)
+    encoding = ENCODINGS[width]
+    lengths = []
+    line = 1
+    offset = 0
+    for length, count, words in buckets:
+        if count:
+            lengths.append((length, line, offset))
+            line += count
+            offset += count * length * width
+    with open(path, "wb") as f:
+        f.write(pack_header(lengths, line - 1, width, alphabet))
+        for length, count, words in buckets:
+            written = 0
+            for word in words:
+                word = word.strip()
+                if len(word) != length:
+                    raise WordBankFormatError(f"{word} is in the length {length} bucket")
+                f.write(word.encode(encoding))
+                written += 1
+            if written != count:
+                raise WordBankFormatError(f"expected {count} words of length {length} but got {written}")
+
+def parse_score_splits(value):
+    """Parses "medium,hard" fractions of the score sorted words (e.g. 0.4,0.8) - raises ValueError if they aren't in order"""
+    medium, hard = (float(x) for x in value.split(","))
+    if not 0 <= medium <= hard <= 1:
+        raise ValueError(f"score splits must be 0 <= medium <= hard <= 1, not {value}")
+    return (medium, hard)
+
+def brackets_from_indices(indices, last_line, thresholds=None):
+    """Places the word lines into easy, medium and hard brackets.  indices is a list of
+    (word length, start line) sorted by length and last_line is the last line of the bank.
+    Returns diff:[length min, start line, end line] - a bracket without words is [min, -1, -1]"""
+    thresholds = DEFAULT_THRESHOLDS if thresholds is None else thresholds
+    brackets = {diff: [thresholds[diff], -1, -1] for diff in DIFFICULTIES}
+    previous = None #difficulty of the previous length
+    for length, start_line in indices:
+        current = None
+        for diff in DIFFICULTIES:
+            if length >= thresholds[diff]:
+                current = diff
+        if current != previous:
+            if previous is not None:
+                brackets[previous][2] = start_line - 1 #previous difficulty ends 1 less than this start
+            if current is not None and brackets[current][1] == -1:
+                brackets[current][1] = start_line
+            previous = current
+    if previous is not None:
+        brackets[previous][2] = last_line
+    return brackets
+
+
+class BinaryWordBank:
+    """Read only view of a binary word bank file.  The file is memory mapped so the pages are
+    shared through the page cache between every process that has it open."""
+
+    def __init__(self, path):
+        try:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise BinaryWordBankError(f"Unable to open the binary word bank {path}: {e}")
+        try:
+            magic, version = struct.unpack_from("<4sH", self._mm, 0)
+            if magic == MAGIC and version == 1:
+                magic, version, num_lengths, num_words, data_offset = HEADER_V1.unpack_from(self._mm, 0)
+                table_offset = HEADER_V1.size
+                width = 1
+                alphabet = DEFAULT_ALPHABET
+            elif magic == MAGIC and version == VERSION:
+                magic, version, num_lengths, num_words, data_offset, width, alphabet_size = HEADER.unpack_from(self._mm, 0)
+                table_offset = HEADER.size
+                alphabet_offset = table_offset + num_lengths * LENGTH_ENTRY.size
+                alphabet = self._mm[alphabet_offset:alphabet_offset + alphabet_size].decode("utf-8")
+            else:
+                raise ValueError(f"not a version 1 or {VERSION} binary word bank")
+            if width not in ENCODINGS:
+                raise ValueError(f"{width} bytes per letter isn't supported")
+        except (struct.error, ValueError) as e:
+            self._mm.close()
+            raise BinaryWordBankError(f"{path} is not a binary word bank: {e}")
+        self.path = path
+        self.num_words = num_words
+        self.char_width = width
+        self.encoding = ENCODINGS[width]
+        self.alphabet = alphabet
+        self._data_offset = data_offset
+        self.lengths = []
+        self.first_lines = []
+        self._offsets = []
+        for i in range(num_lengths):
+            length, first_line, offset = LENGTH_ENTRY.unpack_from(self._mm, table_offset + i * LENGTH_ENTRY.size)
+            self.lengths.append(length)
+            self.first_lines.append(first_line)
+            self._offsets.append(data_offset + offset)
+
+    @classmethod
+    def from_words(cls, words, alphabet=None):
+        """Builds the same packed layout in memory from a list of words - used when there isn't a binary bank file"""
+        lengths, data, num_words, width, alphabet = pack_words(words, alphabet)
+        bank = cls.__new__(cls)
+        bank._mm = bytes(data)
+        bank.path = None
+        bank.num_words = num_words
+        bank.char_width = width
+        bank.encoding = ENCODINGS[width]
+        bank.alphabet = alphabet
+        bank._data_offset = 0
+        bank.lengths = [entry[0] for entry in lengths]
+        bank.first_lines = [entry[1] for entry in lengths]
+        bank._offsets = [entry[2] for entry in lengths]
+        return bank
+
+    def __len__(self):
+        return self.num_words
+
+    def get_word(self, line):
+        """Returns the word on the given line (1 based, same as the text word bank)"""
+        if line < 1 or line > self.num_words:
+            raise IndexError(f"line {line} is outside of the word bank")
+        bucket = bisect_right(self.first_lines, line) - 1 #only ~20 buckets so this is effectively constant
+        size = self.lengths[bucket] * self.char_width
+        start = self._offsets[bucket] + (line - self.first_lines[bucket]) * size
+        return self._mm[start:start + size].decode(self.encoding)
+
+    def buckets(self):
+        """Yields (word length, first line, number of words, packed bytes) for each length bucket.  A word
+        takes length * char_width bytes - decode with the bank's encoding to get the letters."""
+        ends = self.first_lines[1:] + [self.num_words + 1]
+        for length, first_line, offset, end in zip(self.lengths, self.first_lines, self._offsets, ends):
+            count = end - first_line
+            yield length, first_line, count, self._mm[offset:offset + count * length * self.char_width]
+
+    def nbytes(self):
+        return len(self._mm)
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+
+
+def write_scores(scores, path):
+    """Writes the difficulty scores file - scores is a list of 0 to 65535 scores, one per word bank line
+    (higher is harder).  The file also holds the lines sorted by score so the game doesn't have to sort."""
+    order = sorted(range(1, len(scores) + 1), key=lambda line: (scores[line - 1], line))
+    with open(path, "wb") as f:
+        f.write(SCORES_HEADER.pack(SCORES_MAGIC, SCORES_VERSION, len(scores)))
+        f.write(struct.pack(f"<{len(order)}I", *order))
+        f.write(struct.pack(f"<{len(scores)}H", *scores))
+
+def write_weights(weights, path):
+    """Writes the word weights file - weights is a list of uint32 weights, one per word bank line"""
+    with open(path, "wb") as f:
+        f.write(WEIGHTS_HEADER.pack(WEIGHTS_MAGIC, WEIGHTS_VERSION, len(weights)))
+        f.write(struct.pack(f"<{len(weights)}I", *weights))
+
+
+class WordScores:
+    """Memory mapped difficulty scores file.  order[i] is the line of the i'th easiest word and
+    scores[line - 1] is the score of a line."""
+
+    def __init__(self, path):
+        try:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise BinaryWordBankError(f"Unable to open the scores file {path}: {e}")
+        if len(self._mm) < SCORES_HEADER.size:
+            self._mm.close()
+            raise BinaryWordBankError(f"{path} is too small to be a scores file")
+        magic, version, count = SCORES_HEADER.unpack_from(self._mm, 0)
+        if magic != SCORES_MAGIC or version != SCORES_VERSION or len(self._mm) != SCORES_HEADER.size + count * 6:
+            self._mm.close()
+            raise BinaryWordBankError(f"{path} is not a version {SCORES_VERSION} scores file")
+        self.count = count
+        scores_start = SCORES_HEADER.size + count * 4
+        #memoryviews over the mapped pages - native byte order, so this assumes a little endian machine
+        self.order = memoryview(self._mm)[SCORES_HEADER.size:scores_start].cast("I")
+        self.scores = memoryview(self._mm)[scores_start:].cast("H")
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        return len(self._mm)
+
+    def close(self):
+        self.order.release()
+        self.scores.release()
+        self._mm.close()
+
+
+class WordWeights:
+    """Memory mapped word weights file.  weights[line - 1] is how likely a line is to be picked
+    relative to the others (the word's count in a text corpus, plus one)."""
+
+    def __init__(self, path):
+        try:
+            with open(path, "rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise BinaryWordBankError(f"Unable to open the weights file {path}: {e}")
+        if len(self._mm) < WEIGHTS_HEADER.size:
+            self._mm.close()
+            raise BinaryWordBankError(f"{path} is too small to be a weights file")
+        magic, version, count = WEIGHTS_HEADER.unpack_from(self._mm, 0)
+        if magic != WEIGHTS_MAGIC or version != WEIGHTS_VERSION or len(self._mm) != WEIGHTS_HEADER.size + count * 4:
+            self._mm.close()
+            raise BinaryWordBankError(f"{path} is not a version {WEIGHTS_VERSION} weights file")
+        self.count = count
+        self.weights = memoryview(self._mm)[WEIGHTS_HEADER.size:].cast("I") #native byte order, assumes little endian
+
+    def __len__(self):
+        return self.count
+
+    def nbytes(self):
+        return len(self._mm)
+
+    def close(self):
+        self.weights.release()
+        self._mm.close()
+
+
+class AliasTable:
+    """Walker's alias method (Vose's construction) - O(n) to build, then every weighted draw is one
+    random number, one array lookup and one compare, however many items there are."""
+    __slots__ = ("probabilities", "aliases")
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = sum(weights)
+        if count == 0 or total <= 0:
+            raise ValueError("Can't build an alias table without any weight")
+        self.probabilities = array("d", (weight * count / total for weight in weights))
+        self.aliases = array("I", range(count))
+        probabilities = self.probabilities
+        small = [i for i in range(count) if probabilities[i] < 1.0]
+        large = [i for i in range(count) if probabilities[i] >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large[-1]
+            self.aliases[less] = more #the rest of less's column is filled by more
+            probabilities[more] -= 1.0 - probabilities[less]
+            if probabilities[more] < 1.0:
+                small.append(large.pop())
+        for i in small + large: #what is left over is 1 give or take rounding
+            probabilities[i] = 1.0
+
+    def __len__(self):
+        return len(self.probabilities)
+
+    def draw(self, rng=random):
+        """Returns an index picked in proportion to its weight"""
+        u = rng.random() * len(self.probabilities)
+        i = int(u)
+        return i if u - i < self.probabilities[i] else self.aliases[i]
+
+
+class WordBank:
+    """Words bucketed by length with the easy/medium/hard ranges worked out once up front, so
+    picking a word is a random number and a slice - no file reads or parsing per word.
+
+    Without scores the difficulties are ranges of lines split by word length (thresholds).  With
+    WordScores they are ranges of the score sorted order split by score_splits, and a word is
+    picked with one extra array lookup from its position in the order to its line.
+
+    With WordWeights, sample_weighted_line() picks words in proportion to their weights using an
+    alias table per difficulty.  The tables are built with the bank, so a round's first weighted draw
+    costs the same as any other (building them takes a few tens of ms, e.g. on a server's event loop)."""
+
+    def __init__(self, words, thresholds=None, scores=None, score_splits=None, weights=None):
+        self.words = words #BinaryWordBank (memory mapped or built in memory)
+        self.scores = scores
+        self.weights = weights
+        self._alias_tables = {} #difficulty:AliasTable over the difficulty's slots
+        self.indexes = {} #name:index other modules build over the bank (the solver's) - dropped along with the bank
+        self.thresholds = dict(DEFAULT_THRESHOLDS if thresholds is None else thresholds)
+        self.brackets = brackets_from_indices(list(zip(words.lengths, words.first_lines)), len(words), self.thresholds)
+        self._ranges = {} #difficulty:(first slot, last slot) - a slot is a line, or a position in the score order
+        if scores is None:
+            self.difficulty_by = "length"
+            for diff in DIFFICULTIES:
+                self._ranges[diff] = (self.brackets[diff][1], self.brackets[diff][2])
+        else:
+            self.difficulty_by = "score"
+            count = len(scores)
+            medium, hard = (round(count * split) for split in (score_splits or DEFAULT_SCORE_SPLITS))
+            for diff, start, end in (("easy", 1, medium), ("medium", medium + 1, hard), ("hard", hard + 1, count)):
+                self._ranges[diff] = (start, end) if start <= end else (-1, -1)
+        starts = [start for start, end in self._ranges.values() if start != -1]
+        ends = [end for start, end in self._ranges.values() if start != -1]
+        self._ranges["random"] = (min(starts), max(ends)) if starts else (-1, -1) #no difficulty - entire range
+        if weights is not None:
+            for difficulty, (start, end) in self._ranges.items():
+                if start != -1:
+                    self._alias_tables[difficulty] = self._build_alias_table(difficulty)
+
+    def __len__(self):
+        return len(self.words)
+
+    @property
+    def alphabet(self):
+        return self.words.alphabet
+
+    def memory_size(self):
+        """Bytes the bank can have resident - its (mapped) files, alias tables and indexes (each has nbytes())"""
+        size = self.words.nbytes() + sum(len(table) * 12 for table in self._alias_tables.values())
+        size += sum(index.nbytes() for index in self.indexes.values())
+        for extra in (self.scores, self.weights):
+            if extra is not None:
+                size += extra.nbytes()
+        return size
+
+    def slot_range(self, difficulty):
+        """Returns (first slot, last slot) for the difficulty.  Anything other than easy, medium or hard uses every difficulty"""
+        start, end = self._ranges.get(difficulty, self._ranges["random"])
+        if start == -1:
+            raise ValueError(f"The word bank has no {difficulty} words")
+        return start, end
+
+    def line_at(self, slot):
+        """Returns the word bank line for a slot in one of the slot ranges"""
+        return slot if self.scores is None else self.scores.order[slot - 1]
+
+    def get_word(self, line):
+        return self.words.get_word(line)
+
+    def sample_line(self, difficulty, rng=random):
+        start, end = self.slot_range(difficulty)
+        return self.line_at(rng.randint(start, end))
+
+    def sample(self, difficulty, rng=random):
+        """Returns a random word in the difficulty"""
+        return self.words.get_word(self.sample_line(difficulty, rng))
+
+    @metrics.timed("alias_table_build")
+    def _build_alias_table(self, difficulty):
+        start, end = self.slot_range(difficulty)
+        weights = self.weights.weights
+        return AliasTable([weights[self.line_at(slot) - 1] for slot in range(start, end + 1)])
+
+    def alias_table(self, difficulty):
+        """Returns the AliasTable for the difficulty's slots.  Anything other than easy, medium or hard uses every difficulty"""
+        table = self._alias_tables.get(difficulty if difficulty in self._ranges else "random")
+        if table is None:
+            if self.weights is None:
+                raise ValueError("The word bank has no weights")
+            self.slot_range(difficulty) #raises for a difficulty without words
+        return table
+
+    def sample_weighted_line(self, difficulty, rng=random):
+        """Returns a line in the difficulty picked in proportion to the word weights"""
+        return self.line_at(self.slot_range(difficulty)[0] + self.alias_table(difficulty).draw(rng))
+
+    def sample_many(self, difficulty, k, rng=random):
+        """Returns k different random words in the difficulty"""
+        start, end = self.slot_range(difficulty)
+        return [self.words.get_word(self.line_at(slot)) for slot in rng.sample(range(start, end + 1), k)]
+
+    def close(self):
+        self.words.close()
+        if self.scores is not None:
+            self.scores.close()
+        if self.weights is not None:
+            self.weights.close()
+
+
+def load_word_bank(bank_path, bin_path=None, thresholds=None, scores_path=None, score_splits=None, weights_path=None):
+    """Returns the WordBank for the given files, loading it the first time it is asked for.  The memory
+    mapped binary bank is used when bin_path exists, otherwise the text bank is read into memory.
+    Difficulties go by the scores file when scores_path exists and matches the bank, otherwise by length.
+    The bank has weights when weights_path exists and matches the bank."""
+    key = (bank_path, bin_path, tuple(sorted((thresholds or DEFAULT_THRESHOLDS).items())), scores_path, score_splits, weights_path)
+    bank = _loaded_banks.get(key)
+    if bank is None:
+        bank = open_word_bank(bank_path, bin_path, thresholds, scores_path, score_splits, weights_path)
+        _loaded_banks[key] = bank
+    return bank
+
+@metrics.timed("word_bank_load")
+def open_word_bank(bank_path, bin_path=None, thresholds=None, scores_path=None, score_splits=None, weights_path=None):
+    """Opens a WordBank without the load_word_bank cache"""
+    words = None
+    if bin_path is not None:
+        try:
+            words = BinaryWordBank(bin_path)
+        except BinaryWordBankError:
+            words = None
+    if words is None:
+        with open(bank_path, "r", encoding="utf-8") as f:
+            words = BinaryWordBank.from_words(f)
+    scores = None
+    if scores_path is not None:
+        try:
+            scores = WordScores(scores_path)
+        except BinaryWordBankError:
+            scores = None
+        if scores is not None and len(scores) != len(words): #left over from a different build
+            scores.close()
+            scores = None
+    weights = None
+    if weights_path is not None:
+        try:
+            weights = WordWeights(weights_path)
+        except BinaryWordBankError:
+            weights = None
+        if weights is not None and len(weights) != len(words):
+            weights.close()
+            weights = None
+    return WordBank(words, thresholds, scores, score_splits, weights)
+
+def unload_word_banks():
+    """Closes every bank opened by load_word_bank"""
+    for bank in _loaded_banks.values():
+        bank.close()
+    _loaded_banks.clear()
+
+
+class BankRegistry:
+    """Word banks by locale (locale_paths), opened the first time each locale is asked for.  When the
+    open banks add up to more than budget bytes (WordBank.memory_size), the least recently used ones
+    are dropped until they fit - the most recent one always stays.  Dropped banks aren't closed, as
+    games may still be using them; their pages are unmapped once nothing refers to them.  Until then
+    they count toward the budget, and asking for the locale again takes the bank back (with the
+    indexes already built) instead of opening a second copy."""
+
+    def __init__(self, budget=DEFAULT_BANK_BUDGET, thresholds=None, score_splits=None):
+        self.budget = budget
+        self.thresholds = thresholds
+        self.score_splits = score_splits
+        self._banks = OrderedDict() #locale:WordBank, least recently used first
+        self._dropped = weakref.WeakValueDictionary() #locale:dropped WordBank that is still in use
+        self.loads = 0
+        self.reuses = 0 #dropped banks taken back
+        self.evictions = 0
+
+    def __contains__(self, locale):
+        return locale in self._banks
+
+    def __len__(self):
+        return len(self._banks)
+
+    def get(self, locale=DEFAULT_LOCALE):
+        """Returns the locale's WordBank, opening it if it isn't open.  Raises ValueError for a bad locale
+        name and OSError when the locale has no word bank files."""
+        bank = self._banks.get(locale)
+        if bank is not None:
+            self._banks.move_to_end(locale)
+            return bank
+        bank = self._dropped.pop(locale, None)
+        if bank is not None:
+            self.reuses += 1
+        else:
+            paths = locale_paths(locale)
+            bank = open_word_bank(paths["bank"], paths["bin"], self.thresholds, paths["scores"], self.score_splits, paths["weights"])
+            self.loads += 1
+        self._banks[locale] = bank
+        self.evict()
+        return bank
+
+    def memory_size(self):
+        """Bytes of the open banks, and of the dropped ones still in use"""
+        return sum(bank.memory_size() for bank in list(self._banks.values()) + list(self._dropped.values()))
+
+    def evict(self):
+        """Drops the least recently used banks until the rest fit in the budget"""
+        while len(self._banks) > 1 and self.memory_size() > self.budget:
+            locale, bank = self._banks.popitem(last=False)
+            self._dropped[locale] = bank
+            del bank #so the weak reference is all that's left here
+            self.evictions += 1
+            if metrics.ENABLED:
+                metrics.count("word_bank_evictions")
+
+    def close(self):
+        """Closes every open bank - only once nothing is using them"""
+        for bank in list(self._banks.values()) + list(self._dropped.values()):
+            bank.close()
+        self._banks.clear()
+        self._dropped.clear()
@@ -1,6 +1,38 @@
 #!/usr/bin/env python
 
+import argparse
+import hashlib
+import os
 import re
+import shutil
+import tempfile
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from zlib import crc32
+from math import log2
+from word_bank import (BinaryWordBank, WordBank, DEFAULT_ALPHABET, DEFAULT_LOCALE, locale_paths, write_binary_bank,
+    write_binary_bank_buckets, write_scores, write_weights)
+from name_index import NameIndex, ensure_name_index
+from build_cache import BuildCache, file_signature, hash_file, hash_values
+
+VALID_PATTERN = re.compile(r"[a-zA-Z]{3,}$") #only alpha and at least 3 letters
+ACRONYM_PATTERN = re.compile(r"[A-Z]{3,}$") #all capitals
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+") #words in the (lowercased) frequency corpus - letters of any script
+PIPELINE_VERSION = 3 #bump when the filtering changes in a way the patterns don't capture, to invalidate build caches
+#locale:lowercase letters its words may use - other locales need --alphabet
+LOCALE_ALPHABETS = {"en": DEFAULT_ALPHABET,
+    "de": DEFAULT_ALPHABET + "äöüß",
+    "es": DEFAULT_ALPHABET + "áéíñóúü",
+    "fr": DEFAULT_ALPHABET + "àâæçèéêëîïôùûüÿœ",
+    "it": DEFAULT_ALPHABET + "àèéìíîòóùú",
+    "pt": DEFAULT_ALPHABET + "àáâãçéêíóôõú",
+    "pl": "aąbcćdeęfghijklłmnńoóprsśtuwyzźż",
+    "ru": "абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+}
+
+_filter = {} #names index and word patterns for filter_chunk, set up by init_filter
 
 def create_names(names_path, names):
     """Creates the names (SET) that will be checked against before asdding a word to the word bank """
@@ -17,14 +49,14 @@ def create_names(names_path, names):
     print("All done parsing the names file.")
 
 
-def parse_words_file(words_path, words, f_names, l_names):
+def parse_words_file(words_path, words, f_names, l_names, patterns=(VALID_PATTERN, ACRONYM_PATTERN)):
     """Parses the /usr/share/dict/words file into words usable by the hangman program """
     try:
-      with open(words_path, "r") as f:
+      with open(words_path, "r", encoding="utf-8", errors="replace") as f:
         #we want words that are 3 or more letters long
         for line in f:
           parsed_line = parse_word_line(line)
-          if word_is_valid(parsed_line) and not word_is_name(parsed_line, f_names) and not word_is_name(parsed_line, l_names):
+          if word_is_valid(parsed_line, patterns) and not word_is_name(parsed_line, f_names) and not word_is_name(parsed_line, l_names):
             #add new line char at the end since will be using writelines()
             words.append(process_word(parsed_line) + "\n")
 
@@ -35,15 +67,27 @@ def parse_words_file(words_path, words, f_names, l_names):
     print("All done parsing the words file.")
 
 def parse_word_line(line):
-    """Do any line parsing here.  Currently, only performing strip()"""
+    """Do any line parsing here.  Currently, strip() and composing accented letters (NFC) so each is one character"""
     line = line.strip()
+    if not line.isascii():
+        line = unicodedata.normalize("NFC", line)
     return line
 
-def word_is_valid(line):
-    """Word is valid if it contains only alpha and not all capital (not an acronym)"""
-    pattern1 = re.compile(r"[a-zA-Z]{3,}$")
-    pattern2 = re.compile(r"[A-Z]{3,}$")
-    return re.match(pattern1, line) and not re.match(pattern2, line)
+def word_patterns(alphabet=DEFAULT_ALPHABET):
+    """Returns (valid pattern, acronym pattern) for words made of the alphabet's letters in either case"""
+    if alphabet == DEFAULT_ALPHABET:
+        return VALID_PATTERN, ACRONYM_PATTERN
+    upper = "".join(letter.upper() for letter in alphabet if len(letter.upper()) == 1 and letter.upper() != letter)
+    valid = re.compile("[{}]{{3,}}$".format(re.escape(alphabet + upper)))
+    if not upper: #no capitals, so nothing is an acronym
+        return valid, re.compile("(?!)")
+    return valid, re.compile("[{}]{{3,}}$".format(re.escape(upper)))
+
+def word_is_valid(line, patterns=(VALID_PATTERN, ACRONYM_PATTERN)):
+    """Word is valid if it contains only alpha and not all capital (not an acronym).  patterns is
+    word_patterns() for the alphabet the letters have to be in - a to z by default."""
+    valid, acronym = patterns
+    return valid.match(line) and not acronym.match(line)
 
 def word_is_name(word, names):
    return word in names
@@ -54,19 +98,27 @@ def process_word(word):
     return p_word
 
 def arrange_word_list(words):
-    """Sorts the word list alphabetically and by length"""
-    words.sort()
+    """Sorts the word list alphabetically and by length, dropping duplicates (Set and set both lowercase to set)"""
+    words[:] = sorted(set(words))
     words.sort(key=len)
 
 def create_word_bank_file(words, path):
     """Created the word bank file that will be used for the game"""
     try:
-        with open(path, "w") as f:
+        with open(path, "w", encoding="utf-8") as f:
             f.writelines(words)
     except:
         print("Unable to write to the file")
 
 
+def create_binary_word_bank_file(words, path, alphabet=DEFAULT_ALPHABET):
+    """Creates the memory mappable binary version of the word bank file"""
+    try:
+        write_binary_bank(words, path, alphabet)
+    except (IOError, UnicodeEncodeError):
+        print("Unable to write to the binary word bank file")
+
+
 def create_word_indices(words, indices, stats):
     """Creates an indices dictionary from a words list; key = word length:value = line that length starts on"""
     line = 0
@@ -92,7 +144,316 @@ def create_word_indices_file(indices, path, stats):
     except:
         print("Unable to write to the indices file")
 
-def main():
+def compute_difficulty_scores(words, solver_strikes=False, max_strikes=5, known_strikes=None):
+    """Scores every word in a BinaryWordBank from 0 to 65535, higher is harder.  The main part is how
+    many misses a guesser going through the letters from most to least common in the bank would
+    have before finding the word's rarest letter, so short words with rare letters score high and
+    long words full of common letters score low.  The average rarity of the word's letters breaks
+    ties.  With solver_strikes, the strikes the solver needs for the word are added on top.
+    known_strikes (length:bytes of the solver strikes per word) skips solving the buckets it already
+    has - the solver only looks at words of the same length - and gets the solved buckets added."""
+    #letter counts come from str.count over each bucket - done in C, not per word
+    counts = {}
+    for length, first_line, count, data in words.buckets():
+        data = bytes(data).decode(words.encoding)
+        for letter in set(data):
+            counts[letter] = counts.get(letter, 0) + data.count(letter)
+    total = sum(counts.values())
+    ranks = {letter: rank for rank, letter in enumerate(sorted(counts, key=lambda letter: -counts[letter]))}
+    rarity = {letter: -log2(counts[letter] / total) for letter in counts}
+
+    if known_strikes is None:
+        known_strikes = {}
+    solver = None
+    scores = []
+    for length, first_line, count, data in words.buckets():
+        data = bytes(data).decode(words.encoding)
+        bucket_strikes = known_strikes.get(length) if solver_strikes else None
+        if solver_strikes and (bucket_strikes is None or len(bucket_strikes) != count):
+            if solver is None: #not built when every bucket is known
+                from solver import HangmanSolver, SolverIndex
+                solver = HangmanSolver(SolverIndex(WordBank(words)))
+            bucket_strikes = known_strikes[length] = bytes(solver.solve_word(data[start:start + length], max_strikes)[1]
+                for start in range(0, count * length, length))
+        for i, start in enumerate(range(0, count * length, length)):
+            letters = set(data[start:start + length])
+            misses = max(ranks[letter] for letter in letters) + 1 - len(letters)
+            score = misses * 256 + min(255, int(sum(rarity[letter] for letter in letters) / len(letters) * 16))
+            if bucket_strikes is not None:
+                score += bucket_strikes[i] * 256
+            scores.append(min(score, 65535))
+    return scores
+
+def create_difficulty_scores_file(bin_path, path, solver_strikes=False, known_strikes=None):
+    """Creates the difficulty scores file for the binary word bank file (see compute_difficulty_scores for known_strikes)"""
+    words = BinaryWordBank(bin_path)
+    try:
+        write_scores(compute_difficulty_scores(words, solver_strikes, known_strikes=known_strikes), path)
+    except IOError:
+        print("Unable to write to the difficulty scores file")
+    finally:
+        words.close()
+
+def count_word_frequencies(words, corpus_path, block_size=1 << 20):
+    """Counts how often each word of a BinaryWordBank appears in a text corpus, ignoring case.  Returns a
+    list of counts, one per line.  The corpus is read a block of lines at a time and only the bank's
+    words are kept, so memory stays at the size of the bank however big the corpus is."""
+    lines = {} #word:lines it is on (a word can be on more than one line)
+    for length, first_line, count, data in words.buckets():
+        data = bytes(data).decode(words.encoding)
+        for i in range(count):
+            lines.setdefault(data[i * length:(i + 1) * length], []).append(first_line + i)
+    counts = [0] * len(words)
+    with open(corpus_path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            block = f.readlines(block_size)
+            if not block:
+                break
+            text = "".join(block).lower()
+            if not text.isascii():
+                text = unicodedata.normalize("NFC", text)
+            for token, count in Counter(TOKEN_PATTERN.findall(text)).items():
+                for line in lines.get(token, ()):
+                    counts[line - 1] += count
+    return counts
+
+def create_word_weights_file(bin_path, corpus_path, path):
+    """Creates the word weights file (corpus count + 1, so every word can still come up) for the binary word bank file"""
+    words = BinaryWordBank(bin_path)
+    try:
+        write_weights([min(count + 1, 0xFFFFFFFF) for count in count_word_frequencies(words, corpus_path)], path)
+    except IOError:
+        print("Unable to write to the word weights file")
+    finally:
+        words.close()
+
+def remove_word_weights_file(path):
+    """Removes a weights file left from an earlier build - it would weight the wrong words"""
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
+def init_filter(index_path, alphabet=DEFAULT_ALPHABET):
+    """Opens the names index used by filter_chunk - the process pool initializer.  The index is
+    memory mapped, so every worker shares the same pages."""
+    _filter["index_path"] = index_path
+    _filter["index"] = NameIndex(index_path)
+    _filter["alphabet"] = alphabet
+    _filter["patterns"] = word_patterns(alphabet)
+
+def filter_chunk(data):
+    """Filters and lowercases a chunk (bytes) of the words file.  Returns a dictionary of
+    word length:sorted list of words without duplicates (a sorted run for each length)"""
+    names = _filter["index"]
+    patterns = _filter["patterns"]
+    buckets = {}
+    for line in data.decode("utf-8", "replace").splitlines():
+        parsed_line = parse_word_line(line)
+        if word_is_valid(parsed_line, patterns) and not names.is_name(parsed_line):
+            word = process_word(parsed_line)
+            buckets.setdefault(len(word), []).append(word)
+    return {length: sorted(set(words)) for length, words in buckets.items()}
+
+def filter_keyed_chunk(key, data):
+    return key, filter_chunk(data)
+
+def read_chunks(words_path, chunk_size, stats):
+    """Reads the words file in chunks of roughly chunk_size bytes (whole lines only).  The chunk
+    boundaries are picked from the content of the lines (content defined chunking), so an edit to the
+    words file only changes the chunks around it instead of shifting every chunk after it."""
+    start = time.perf_counter()
+    lines = []
+    size = 0
+    with open(words_path, "rb") as f:
+        for line in f:
+            lines.append(line)
+            size += len(line)
+            #cut once past half the chunk size on a line whose hash ends in 8 zero bits (about every 256 lines)
+            if (size >= chunk_size // 2 and crc32(line) & 0xFF == 0) or size >= chunk_size * 2:
+                stats["lines"] += len(lines)
+                stats["bytes"] += size
+                stats["read_seconds"] += time.perf_counter() - start
+                yield b"".join(lines)
+                start = time.perf_counter()
+                lines = []
+                size = 0
+    if lines:
+        stats["lines"] += len(lines)
+        stats["bytes"] += size
+        stats["read_seconds"] += time.perf_counter() - start
+        yield b"".join(lines)
+
+def filter_chunks(chunks, workers):
+    """Yields (key, filter_chunk result) for each (key, chunk data), using a process pool when workers > 1.
+    Only a couple of chunks per worker are in flight at a time so memory doesn't grow with the input size."""
+    if workers <= 1:
+        for key, data in chunks:
+            yield filter_keyed_chunk(key, data)
+        return
+    init_args = (_filter["index_path"], _filter["alphabet"])
+    with ProcessPoolExecutor(workers, initializer=init_filter, initargs=init_args) as executor:
+        pending = set()
+        for key, data in chunks:
+            pending.add(executor.submit(filter_keyed_chunk, key, data))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+def read_bucket(path):
+    with open(path, "r", encoding="utf-8") as f:
+        yield from f
+
+def build_word_bank(words_path, bank_path, idx_path, bin_path, scores_path, first_file, last_file, names_index_path,
+        workers=1, chunk_size=1 << 20, cache_dir=".word_bank_cache", force=False, solver_scores=False, corpus_path=None,
+        weights_path=None, alphabet=DEFAULT_ALPHABET):
+    """Streaming, incremental word bank build.  The words file is read in chunks; chunks that aren't in
+    the build cache are filtered (across a process pool when workers > 1) and saved there.  Each word
+    length bucket is then re-merged (dropping words that are in more than one chunk) only if one of
+    its chunk sections changed, and the word bank,
+    binary word bank, index and difficulty scores files are written from the buckets.  When the settings, names files and
+    words file all hash the same as the last build and the outputs are untouched, nothing is rebuilt.
+    Memory stays bounded by chunk_size no matter how big the words file is.  cache_dir=None builds
+    without a cache (in a temp dir).  With corpus_path, the word weights file is written to weights_path
+    from the corpus word counts.  Only words made of the alphabet's letters are kept.  Returns the per stage stats."""
+    stats = {"lines": 0, "bytes": 0, "words": 0, "chunks": 0, "chunks_cached": 0, "buckets": 0, "buckets_rebuilt": 0,
+        "up_to_date": False, "hash_seconds": 0.0, "read_seconds": 0.0, "filter_seconds": 0.0, "merge_seconds": 0.0, "write_seconds": 0.0,
+        "score_seconds": 0.0, "weight_seconds": 0.0}
+    start = time.perf_counter()
+    ensure_name_index(first_file, last_file, names_index_path)
+    patterns = word_patterns(alphabet)
+    settings = hash_values(patterns[0].pattern, patterns[1].pattern, str(chunk_size), str(PIPELINE_VERSION), str(solver_scores))
+    names = hash_values(hash_file(first_file), hash_file(last_file))
+    inputs = {"settings": settings, "names": names, "words": hash_file(words_path)}
+    outputs = [bank_path, idx_path, bin_path, scores_path]
+    if corpus_path is not None:
+        inputs["corpus"] = hash_file(corpus_path)
+        outputs.append(weights_path)
+    stats["hash_seconds"] = time.perf_counter() - start
+
+    temp_cache = cache_dir is None
+    cache = BuildCache(tempfile.mkdtemp(prefix="word_bank_") if temp_cache else cache_dir)
+    try:
+        if not force and cache.is_up_to_date(inputs, outputs):
+            stats["up_to_date"] = True
+            return stats
+
+        #filter the chunks that aren't cached yet
+        init_filter(names_index_path, alphabet)
+        start = time.perf_counter()
+        chunk_hashes = []
+        chunk_sections = {} #chunk hash:length:[byte offset, count, digest]
+        def uncached_chunks():
+            for data in read_chunks(words_path, chunk_size, stats):
+                chunk_hash = hash_values(settings, names, hashlib.sha256(data).hexdigest())
+                chunk_hashes.append(chunk_hash)
+                if chunk_hash in chunk_sections:
+                    continue
+                sections = cache.load_chunk(chunk_hash)
+                if sections is not None:
+                    chunk_sections[chunk_hash] = sections
+                    stats["chunks_cached"] += 1
+                else:
+                    chunk_sections[chunk_hash] = None #being filtered
+                    yield chunk_hash, data
+        for chunk_hash, buckets in filter_chunks(uncached_chunks(), workers):
+            chunk_sections[chunk_hash] = cache.save_chunk(chunk_hash, buckets)
+        stats["chunks"] = len(chunk_hashes)
+        stats["filter_seconds"] = time.perf_counter() - start - stats["read_seconds"]
+
+        #re-merge the buckets whose sections changed
+        start = time.perf_counter()
+        lengths = {} #length:list of (chunk hash, byte offset, count, digest)
+        for chunk_hash in chunk_hashes:
+            for length, (offset, count, digest) in chunk_sections[chunk_hash].items():
+                lengths.setdefault(length, []).append((chunk_hash, offset, count, digest))
+        bucket_keys = {}
+        counts = {}
+        for length in sorted(lengths):
+            sections = lengths[length]
+            bucket_keys[str(length)] = hash_values(*sorted(section[3] for section in sections))
+            if force or not cache.bucket_is_current(length, bucket_keys[str(length)]):
+                counts[length] = cache.build_bucket(length, [section[:3] for section in sections])
+                stats["buckets_rebuilt"] += 1
+            else:
+                counts[length] = cache.bucket_count(length)
+        stats["buckets"] = len(lengths)
+        stats["merge_seconds"] = time.perf_counter() - start
+
+        #write the word bank files from the buckets
+        start = time.perf_counter()
+        with open(bank_path, "wb") as bank_file:
+            for length in sorted(lengths):
+                with open(cache.bucket_path(length), "rb") as bucket_file:
+                    shutil.copyfileobj(bucket_file, bank_file)
+        write_binary_bank_buckets([(length, counts[length], read_bucket(cache.bucket_path(length))) for length in sorted(lengths)], bin_path, alphabet)
+        indices = {}
+        line = 1
+        for length in sorted(lengths):
+            indices[length] = line
+            line += counts[length]
+        stats["words"] = line - 1
+        create_word_indices_file(indices, idx_path, {"first_line": 1, "last_line": line - 1})
+        stats["write_seconds"] = time.perf_counter() - start
+
+        #the solver strikes of a bucket are kept under its key, so only the re-merged buckets are solved again
+        start = time.perf_counter()
+        known_strikes = None
+        if solver_scores:
+            known_strikes = {}
+            for length in ([] if force else lengths):
+                strikes = cache.load_strikes(bucket_keys[str(length)])
+                if strikes is not None:
+                    known_strikes[length] = strikes
+            cached = set(known_strikes)
+        create_difficulty_scores_file(bin_path, scores_path, solver_scores, known_strikes)
+        if solver_scores:
+            for length, strikes in known_strikes.items():
+                if length not in cached:
+                    cache.save_strikes(bucket_keys[str(length)], strikes)
+            stats["buckets_solved"] = len(known_strikes) - len(cached)
+        stats["score_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if corpus_path is not None:
+            create_word_weights_file(bin_path, corpus_path, weights_path)
+        else:
+            remove_word_weights_file(weights_path)
+        stats["weight_seconds"] = time.perf_counter() - start
+
+        if not temp_cache:
+            cache.save_manifest({"inputs": inputs, "chunks": chunk_hashes, "buckets": bucket_keys,
+                "bucket_counts": {str(length): count for length, count in counts.items()},
+                "outputs": {path: file_signature(path) for path in outputs}})
+            cache.prune(chunk_hashes, lengths, bucket_keys.values() if solver_scores else ())
+    finally:
+        if temp_cache:
+            shutil.rmtree(cache.cache_dir, ignore_errors=True)
+    return stats
+
+def print_build_stats(stats):
+    if stats["up_to_date"]:
+        print("Word bank is up to date ({:.2f}s to check)".format(stats["hash_seconds"]))
+        return
+    megabytes = stats["bytes"] / (1 << 20)
+    print("  hash: {:.2f}s".format(stats["hash_seconds"]))
+    for stage, amount, unit in (("read", megabytes, "MB/s"), ("filter", megabytes, "MB/s"), ("merge", stats["words"], "words/s"), ("write", stats["words"], "words/s")):
+        seconds = max(stats[stage + "_seconds"], 1e-9)
+        print("{:>6}: {:.2f}s  {:,.1f} {}".format(stage, seconds, amount / seconds, unit))
+    print("  score: {:.2f}s".format(stats["score_seconds"]))
+    if stats["weight_seconds"]:
+        print(" weight: {:.2f}s".format(stats["weight_seconds"]))
+    print("{:,} lines read, {:,} words in the word bank".format(stats["lines"], stats["words"]))
+    print("{} of {} chunks from the cache, {} of {} length buckets rebuilt".format(stats["chunks_cached"], stats["chunks"],
+        stats["buckets_rebuilt"], stats["buckets"]))
+    if "buckets_solved" in stats:
+        print("{} of {} length buckets solved for the scores".format(stats["buckets_solved"], stats["buckets"]))
+
+def build_in_memory(input_file, solver_scores=False, corpus_file=None, locale=DEFAULT_LOCALE, alphabet=DEFAULT_ALPHABET):
+    """The original build - keeps the whole word list in memory.  Fine for /usr/share/dict/words"""
+    paths = locale_paths(locale)
+
     #Create the names set
     first_file = "names/first_names.txt"
     f_names = set()
@@ -105,23 +466,69 @@ def main():
 
 
     #Parse the words file and create a list of valid words
-    input_file = "/usr/share/dict/words"
     words = []
-    parse_words_file(input_file, words, f_names, l_names)
+    parse_words_file(input_file, words, f_names, l_names, word_patterns(alphabet))
 
     #Sort the words by alpha and length
     arrange_word_list(words)
 
     #Create the actual word bank file that will be used
-    output_file = "hangman_word_bank"
+    output_file = paths["bank"]
     create_word_bank_file(words, output_file)
 
+    #Create the binary word bank that hangman.py memory maps for O(1) word lookups
+    binary_file = paths["bin"]
+    create_binary_word_bank_file(words, binary_file, alphabet)
+
+    #Score how hard each word is so hangman.py can pick difficulties by score instead of length
+    create_difficulty_scores_file(binary_file, paths["scores"], solver_scores)
+
+    #Weight the words by how often they come up in the corpus so common words are picked more often
+    weights_file = paths["weights"]
+    if corpus_file is not None:
+        create_word_weights_file(binary_file, corpus_file, weights_file)
+    else:
+        remove_word_weights_file(weights_file)
+
     #Create an index file that will, hopefully, allow for more intelligent word lookups
     stats = {"first_line": 1, "last_line": 0}
     indices = {}
     create_word_indices(words, indices, stats)
-    indices_file = "hangman_word_bank_idx"
+    indices_file = paths["idx"]
     create_word_indices_file(indices, indices_file, stats)
 
+def main():
+    parser = argparse.ArgumentParser(description="Builds the hangman word bank files from a words file")
+    parser.add_argument("input", nargs="?", default="/usr/share/dict/words", help="words file, one word per line")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="filter processes")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="bytes of the words file per chunk")
+    parser.add_argument("--cache-dir", help="build cache for incremental rebuilds (default .word_bank_cache, plus _<locale> for other locales)")
+    parser.add_argument("--no-cache", action="store_true", help="build from scratch without reading or writing the cache")
+    parser.add_argument("--force", action="store_true", help="rebuild every bucket even if the cache says it is current")
+    parser.add_argument("--solver-scores", action="store_true", help="add the solver's strikes to the difficulty scores (slower)")
+    parser.add_argument("--corpus", help="text file to count word frequencies in - common words are picked more often")
+    parser.add_argument("--in-memory", action="store_true", help="use the original in memory build")
+    parser.add_argument("--locale", default=DEFAULT_LOCALE, help="language of the words file - picks the output file names "
+        "and the alphabet (built in: {})".format(", ".join(sorted(LOCALE_ALPHABETS))))
+    parser.add_argument("--alphabet", help="lowercase letters the words may use, for locales without a built in alphabet")
+    args = parser.parse_args()
+
+    alphabet = args.alphabet or LOCALE_ALPHABETS.get(args.locale)
+    if alphabet is None:
+        parser.error(f"there is no built in alphabet for {args.locale} - pass --alphabet")
+    try:
+        paths = locale_paths(args.locale)
+    except ValueError as e:
+        parser.error(str(e))
+    alphabet = "".join(sorted(set(unicodedata.normalize("NFC", alphabet.lower()))))
+    if args.in_memory:
+        build_in_memory(args.input, args.solver_scores, args.corpus, args.locale, alphabet)
+        return
+    cache_dir = args.cache_dir or (".word_bank_cache" if args.locale == DEFAULT_LOCALE else ".word_bank_cache_" + args.locale)
+    stats = build_word_bank(args.input, paths["bank"], paths["idx"], paths["bin"], paths["scores"],
+        "names/first_names.txt", "names/last_names.txt", "names/names.idx", args.workers, args.chunk_size, None if args.no_cache else cache_dir, args.force, args.solver_scores,
+        args.corpus, paths["weights"], alphabet)
+    print_build_stats(stats)
+
 if __name__ == "__main__":
   main()